@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "leaves.middleware.ViewMetricsMiddleware",   # ✅ 뷰별 응답 시간 (맨 앞)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "leaves.middleware.VisitorCountMiddleware",
+    "leaves.middleware.BalanceMemoMiddleware",
 ]
 
 ROOT_URLCONF = 'leave.urls'
@@ -65,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'leaves.context_processors.balances',
             ],
         },
     },
@@ -72,6 +75,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'leave.wsgi.application'
 
+# ✅ ASGI 로 띄울 때 공개 조회 화면(달력/이벤트/개인페이지)을 async 뷰로 (leave/asgi.py 에서 설정)
+LEAVE_ASYNC_VIEWS = os.environ.get("LEAVE_ASYNC_VIEWS", "0") == "1"
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -80,6 +86,18 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # 테스트도 파일 DB (메모리 DB 는 공유 캐시 잠금이라 동시 신청 스레드 테스트가 실제와 다름)
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# Cache
+# ✅ gunicorn 워커끼리 공유되도록 파일 캐시 사용 (달력 월 캐시 무효화가 모든 워커에 반영)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("DJANGO_CACHE_DIR", str(BASE_DIR / ".cache")),
     }
 }
 
@@ -132,6 +150,9 @@ X_FRAME_OPTIONS = "SAMEORIGIN"
 
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "")
+TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")  # 시험용 가짜 서버로 바꿀 때
+# ✅ 알림 전달: True 면 웹 프로세스 안 스레드, False 면 manage.py send_notifications 를 따로 실행
+OUTBOX_THREAD = os.environ.get("OUTBOX_THREAD", "1") == "1"
 SITE_BASE_URL = os.environ.get("SITE_BASE_URL", "http://192.168.0.236:8000")  # 배포시 도메인으로 변경
 
 FORCE_SCRIPT_NAME = "/leave"
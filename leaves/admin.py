@@ -1,6 +1,13 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.db import transaction
+from django.shortcuts import redirect, render
+from django.urls import path
+from django.utils import timezone
 from .models import Employee, LeaveYear, CompDayGrant, LeaveRequest
-from .models import CalendarMemo
+from .leave_import import import_rows, read_rows
+from .rededuct import rededuct
+from .models import CalendarMemo, CompanyHoliday, Notification
 
 
 @admin.register(Employee)
@@ -18,6 +25,14 @@ class LeaveYearAdmin(admin.ModelAdmin):
     search_fields = ("employee__name",)
     ordering = ("-year", "employee__name")
     list_editable = ("base_days", "carry_over")  # ✅ 목록에서 바로 수정
+    actions = ("rededuct_years",)
+
+    @admin.action(description="선택한 연도 대체/연차 차감 다시 계산")
+    def rededuct_years(self, request, queryset):
+        ids = list(queryset.values_list("id", flat=True))
+        with transaction.atomic():
+            changed = rededuct(dict.fromkeys(ids), grants_changed=True)
+        messages.success(request, f"{len(ids)}개 연도, 신청 {changed}건 차감을 다시 나눴습니다.")
 
 
 @admin.register(CompDayGrant)
@@ -36,6 +51,11 @@ class CompDayGrantAdmin(admin.ModelAdmin):
         return obj.leave_year.year
 
 
+class LeaveImportForm(forms.Form):
+    file = forms.FileField(label="CSV / XLSX 파일")
+    dry_run = forms.BooleanField(label="미리보기만 (저장 안 함)", required=False, initial=True)
+
+
 @admin.register(LeaveRequest)
 class LeaveRequestAdmin(admin.ModelAdmin):
     list_display = (
@@ -47,9 +67,78 @@ class LeaveRequestAdmin(admin.ModelAdmin):
     list_filter = ("leave_type", "half_day", "start_date", "leave_year__year")
     search_fields = ("employee__name", "reason")
     ordering = ("-start_date", "-created_at")
+    change_list_template = "admin/leaves/leaverequest/change_list.html"
+    actions = ("rededuct_after",)
+
+    @admin.action(description="선택한 신청부터 대체/연차 차감 다시 계산")
+    def rededuct_after(self, request, queryset):
+        since = {}
+        for ly_id, start in queryset.values_list("leave_year_id", "start_date"):
+            since[ly_id] = min(since.get(ly_id, start), start)
+        with transaction.atomic():
+            changed = rededuct(since)
+        messages.success(request, f"신청 {changed}건 차감을 다시 나눴습니다.")
+
+    def get_urls(self):
+        return [
+            path("import/", self.admin_site.admin_view(self.import_view), name="leaves_leaverequest_import"),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        # ✅ 엑셀/CSV 일괄 등록 (미리보기 후 저장)
+        report = None
+        form = LeaveImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            try:
+                rows = read_rows(upload, upload.name)
+            except ValueError as e:
+                messages.error(request, str(e))
+            else:
+                report = import_rows(rows, dry_run=form.cleaned_data["dry_run"])
+                if report.created:
+                    messages.success(request, f"{report.created}건 등록했습니다.")
+                    return redirect("admin:leaves_leaverequest_changelist")
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "휴무 일괄 등록",
+            "form": form,
+            "report": report,
+        }
+        return render(request, "admin/leaves/leaverequest/import.html", context)
+
 
 @admin.register(CalendarMemo)
 class CalendarMemoAdmin(admin.ModelAdmin):
     list_display = ("memo_date", "title", "content", "updated_at")
     list_filter = ("memo_date",)
-    search_fields = ("title", "content")
\ No newline at end of file
+    search_fields = ("title", "content")
+
+@admin.register(CompanyHoliday)
+class CompanyHolidayAdmin(admin.ModelAdmin):
+    list_display = ("date", "name", "is_off", "updated_at")
+    list_filter = ("is_off",)
+    search_fields = ("name",)
+    ordering = ("-date",)
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "attempts", "next_attempt_at", "short_text", "last_error", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("text", "last_error")
+    ordering = ("-id",)
+    actions = ("retry_now",)
+
+    @admin.display(description="내용")
+    def short_text(self, obj):
+        return obj.text[:40]
+
+    @admin.action(description="선택한 알림 지금 다시 보내기")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=Notification.Status.SENT).update(
+            status=Notification.Status.PENDING, attempts=0, next_attempt_at=timezone.now(),
+        )
+        messages.success(request, f"{updated}건을 다시 보낼 함에 넣었습니다.")
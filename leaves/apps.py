@@ -1,6 +1,38 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def _serving() -> bool:
+    """
+    웹 서버 프로세스인지 (gunicorn/uvicorn/runserver 등)
+    - manage.py 명령(migrate, test, send_notifications ...)은 runserver 만
+    - runserver 자동 재시작: 실제로 요청을 받는 자식 프로세스(RUN_MAIN)만
+    """
+    prog = os.path.basename(sys.argv[0]) if sys.argv else ""
+    if prog not in ("manage.py", "django-admin", "__main__.py"):
+        return True
+    if len(sys.argv) < 2 or sys.argv[1] != "runserver":
+        return False
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
+
+
 class LeavesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'leaves'
+
+    def ready(self):
+        from django.utils import timezone
+        from . import signals  # noqa: F401  (시그널 등록)
+        from . import holiday_table
+        from . import view_metrics  # noqa: F401  (DB 연결에 측정 wrapper 등록)
+
+        # ✅ 공휴일 테이블 미리 계산 (작년~내후년)
+        this_year = timezone.localdate().year
+        holiday_table.warm(range(this_year - 1, this_year + 3))
+
+        # ✅ 알림 전달 스레드는 서버 시작 때 (첫 신청을 기다리지 않고 밀린 알림부터 보냄)
+        from . import outbox
+        if outbox.OUTBOX_THREAD and _serving():
+            outbox.start()
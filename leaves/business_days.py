@@ -0,0 +1,70 @@
+# leaves/business_days.py
+"""
+영업일(근무일) 계산 - 신청 차감 일수 / 월별 배분 / 재계산 작업 공용
+- 월~금 일수는 반복 없이 계산
+- 평일 공휴일(holiday_table, 관리자 등록분 반영)은 년도별 정렬 배열 + bisect 로 빼기
+- 여러 기간을 한 번에: leave_units_batch
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date
+from decimal import Decimal
+
+from . import holiday_table
+
+HALF_DAY = Decimal("0.5")
+
+_weekday_holidays = {}   # {year: (year_table 객체, [평일 공휴일 ordinal 정렬])}
+
+
+def weekdays_between(start: date, end: date) -> int:
+    """start~end(포함) 월~금 일수"""
+    if end < start:
+        return 0
+    days = (end - start).days + 1
+    weeks, rest = divmod(days, 7)
+    # 남은 rest 일 중 평일 수: 시작 요일부터 rest 일 (토=5, 일=6 제외)
+    wd = start.weekday()
+    extra = sum(1 for i in range(rest) if (wd + i) % 7 < 5)
+    return weeks * 5 + extra
+
+
+def _holiday_ordinals(year: int) -> list:
+    table = holiday_table.year_table(year)
+    cached = _weekday_holidays.get(year)
+    if cached is None or cached[0] is not table:
+        # 공휴일 테이블이 다시 만들어졌으면(관리자 등록분 변경) 같이 갱신
+        cached = (table, sorted(d.toordinal() for d in table if d.weekday() < 5))
+        _weekday_holidays[year] = cached
+    return cached[1]
+
+
+def weekday_holidays_between(start: date, end: date) -> int:
+    """start~end(포함) 평일 공휴일 수"""
+    count = 0
+    lo, hi = start.toordinal(), end.toordinal()
+    for year in range(start.year, end.year + 1):
+        days = _holiday_ordinals(year)
+        count += bisect_right(days, hi) - bisect_left(days, lo)
+    return count
+
+
+def business_days(start: date, end: date) -> int:
+    """start~end(포함) 영업일 수 (주말/공휴일 제외). 순서가 바뀌어 들어와도 처리"""
+    if end < start:
+        start, end = end, start
+    return weekdays_between(start, end) - weekday_holidays_between(start, end)
+
+
+def leave_units(leave_type: str, start: date, end: date) -> Decimal:
+    """신청 차감 일수: 반차 0.5 / 연차 = 기간 영업일 수"""
+    if leave_type == "HALF":
+        return HALF_DAY
+    return Decimal(business_days(start, end or start))
+
+
+def leave_units_batch(rows) -> list:
+    """[(leave_type, start, end), ...] -> [차감 일수, ...] (공휴일 배열은 년도별 한 번만 준비)"""
+    rows = list(rows)
+    for year in {y for _, s, e in rows for y in range(s.year, (e or s).year + 1)}:
+        _holiday_ordinals(year)
+    return [leave_units(leave_type, start, end) for leave_type, start, end in rows]
@@ -0,0 +1,167 @@
+# leaves/calendar_push.py
+"""
+열린 달력에 변경 알림 보내기 (ASGI 는 SSE, 동기 워커는 기다리지 않는 조건부 polling)
+- 휴무/메모 저장·삭제 시 CalendarChange 한 줄 기록 (signals.py, 커밋 후)
+- 클라이언트는 마지막으로 받은 id 이후 변경만 받아서 달력에 바로 반영
+  -> 전체 다시 불러오기 대신 변경 건수만큼만 전송
+- 워커가 여러 개여도 DB 테이블을 보므로 어느 워커에서 쓰든 전달됨
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .calendar_events import leave_event, memo_event
+from .models import CalendarChange, LeaveRequest, CalendarMemo
+
+# 연결 하나를 붙잡고 있는 최대 시간(초). 끝나면 브라우저가 Last-Event-ID 로 재접속
+CALENDAR_PUSH_MAX_SECONDS = getattr(settings, "CALENDAR_PUSH_MAX_SECONDS", 55)
+# 변경 테이블 확인 간격(초)
+CALENDAR_PUSH_POLL_SECONDS = getattr(settings, "CALENDAR_PUSH_POLL_SECONDS", 2)
+# 동기(WSGI) 워커: SSE / long-poll 대신 바로 응답 (워커를 붙잡지 않음)
+#   브라우저는 CALENDAR_SYNC_POLL_SECONDS 뒤 다시 요청 (변경 없으면 304)
+CALENDAR_SYNC_POLL_SECONDS = getattr(settings, "CALENDAR_SYNC_POLL_SECONDS", 10)
+# 이 시간이 지난 알림은 삭제 (그보다 오래 끊겼던 화면은 전체 다시 불러오기)
+CALENDAR_CHANGE_KEEP = timedelta(days=1)
+HEARTBEAT_SECONDS = 15
+
+
+def _leave_payload(r: LeaveRequest):
+    return leave_event({
+        "id": r.id,
+        "start_date": r.start_date,
+        "end_date": r.end_date,
+        "leave_type": r.leave_type,
+        "half_day": r.half_day,
+        "employee__name": r.employee.name,
+    })
+
+
+def describe_change(instance, action):
+    """
+    LeaveRequest / CalendarMemo 변경 1건 -> CalendarChange 필드
+    (삭제 후에는 pk 가 비므로 시그널 시점에 미리 만들어 둠)
+    """
+    removed = action == CalendarChange.Action.REMOVED
+    if isinstance(instance, LeaveRequest):
+        return {
+            "action": action,
+            "event_id": str(instance.id),
+            "start_date": instance.start_date,
+            "end_date": (instance.end_date or instance.start_date) + timedelta(days=1),
+            "event": None if removed else _leave_payload(instance),
+        }
+    if isinstance(instance, CalendarMemo):
+        return {
+            "action": action,
+            "event_id": f"memo-{instance.id}",
+            "start_date": instance.memo_date,
+            "end_date": instance.memo_date + timedelta(days=1),
+            "event": None if removed else memo_event(instance),
+        }
+    return None
+
+
+def record_change(fields):
+    change = CalendarChange.objects.create(**fields)
+    if change.id % 100 == 0:
+        CalendarChange.objects.filter(created_at__lt=timezone.now() - CALENDAR_CHANGE_KEEP).delete()
+    return change
+
+
+def latest_seq() -> int:
+    return CalendarChange.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def changes_since(seq: int, upto: int, start=None, end=None):
+    """seq < id <= upto 변경 (start~end 가 있으면 그 기간과 겹치는 것만)"""
+    qs = CalendarChange.objects.filter(id__gt=seq, id__lte=upto).order_by("id")
+    if start and end:
+        qs = qs.filter(start_date__lt=end, end_date__gt=start)
+    return [
+        {
+            "seq": c.id,
+            "action": c.action,
+            "id": int(c.event_id) if c.event_id.isdigit() else c.event_id,
+            "start": c.start_date.isoformat(),
+            "end": c.end_date.isoformat(),
+            "event": c.event,
+        }
+        for c in qs
+    ]
+
+
+def _poll(seq, start, end):
+    """
+    -> (새 순번, 변경목록)
+    최신 id 를 먼저 읽고 그 이하만 조회 -> 기간 밖 변경을 건너뛰어도 놓치는 것 없음
+    """
+    upto = latest_seq()
+    if upto <= seq:
+        return seq, []
+    return upto, changes_since(seq, upto, start, end)
+
+
+def poll_changes(seq: int, start=None, end=None):
+    """기다리지 않고 지금까지의 변경 -> (last_seq, changes)"""
+    return _poll(seq, start, end)
+
+
+class _SSEState:
+    """SSE 한 연결의 상태 (sync / async 공용)"""
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.deadline = time.monotonic() + CALENDAR_PUSH_MAX_SECONDS
+        self.last_beat = time.monotonic()
+
+    def hello(self):
+        return f"retry: 3000\nid: {self.seq}\nevent: hello\ndata: {{}}\n\n"
+
+    def alive(self):
+        return time.monotonic() < self.deadline
+
+    def messages(self, upto, changes):
+        out = []
+        for c in changes:
+            out.append(f"id: {c['seq']}\ndata: {json.dumps(c, ensure_ascii=False)}\n\n")
+            self.last_beat = time.monotonic()
+        if upto != self.seq and not changes:
+            self.last_beat = 0  # 기간 밖 변경만 있었음 -> 아래 ping 으로 순번만 갱신
+        self.seq = upto
+        if time.monotonic() - self.last_beat >= HEARTBEAT_SECONDS:
+            # 프록시가 연결을 끊지 않도록 주석 줄 전송 (순번도 갱신)
+            out.append(f"id: {self.seq}\n: ping\n\n")
+            self.last_beat = time.monotonic()
+        return out
+
+
+## ===== ASGI 용 (대기 중에 스레드를 붙잡지 않음) =====
+_apoll = sync_to_async(_poll)
+
+
+async def await_for_changes(seq: int, start=None, end=None, timeout=None):
+    """long-poll: 변경이 생기거나 timeout 이 될 때까지 대기 -> (last_seq, changes)"""
+    deadline = time.monotonic() + (CALENDAR_PUSH_MAX_SECONDS if timeout is None else timeout)
+    while True:
+        seq, changes = await _apoll(seq, start, end)
+        if changes or time.monotonic() >= deadline:
+            return seq, changes
+        await asyncio.sleep(CALENDAR_PUSH_POLL_SECONDS)
+
+
+async def asse_stream(seq: int, start=None, end=None):
+    """
+    text/event-stream 본문 생성기 (ASGI 전용)
+    동기 워커에서 돌리면 연결마다 워커 하나를 최대 CALENDAR_PUSH_MAX_SECONDS 붙잡으므로 제공하지 않음
+    """
+    state = _SSEState(seq)
+    yield state.hello()
+    while state.alive():
+        for msg in state.messages(*await _apoll(state.seq, start, end)):
+            yield msg
+        await asyncio.sleep(CALENDAR_PUSH_POLL_SECONDS)
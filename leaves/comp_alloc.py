@@ -0,0 +1,110 @@
+# leaves/comp_alloc.py
+"""
+대체휴무 사용 배분 (어떤 공휴일 발생분을 썼는지)
+- 신청의 used_comp 를 같은 LeaveYear 발생분에 근무일이 오래된 순(FIFO)으로 나눠서 CompDayUse 로 저장
+- 발생분마다 remaining(남은 양) 유지 -> remaining > 0 부분 인덱스로 다음 배분 대상을 바로 찾음
+- signals.py 에서 신청 저장/삭제 때 호출 (쓰기와 같은 트랜잭션)
+- bulk 작업(시그널 없음)은 호출한 쪽에서 allocate / release 해야 함
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import F
+
+from .models import CompDayGrant, CompDayUse, LeaveRequest
+
+ZERO = Decimal("0")
+
+
+def allocate(leave_request) -> list:
+    """
+    leave_request.used_comp 만큼 남은 발생분에서 차감 -> 만든 CompDayUse 목록
+    (쿼리: 남은 발생분 1 + CompDayUse bulk 1 + remaining bulk 1)
+    """
+    need = Decimal(str(leave_request.used_comp or 0))
+    if need <= 0:
+        return []
+
+    grants = (
+        CompDayGrant.objects.select_for_update()
+        .filter(leave_year_id=leave_request.leave_year_id, remaining__gt=0)
+        .order_by("worked_date", "id")
+        .only("id", "remaining")
+    )
+    uses, touched = [], []
+    for g in grants:
+        take = min(g.remaining, need)
+        g.remaining -= take
+        need -= take
+        uses.append(CompDayUse(leave_request=leave_request, grant_id=g.id, amount=take))
+        touched.append(g)
+        if need <= 0:
+            break
+    # 발생분보다 많이 쓴 경우(관리자 수정 등) 나머지는 배분 없이 둠
+
+    if uses:
+        CompDayUse.objects.bulk_create(uses)
+        CompDayGrant.objects.bulk_update(touched, ["remaining"])
+    return uses
+
+
+def release(leave_request_id) -> None:
+    """신청의 배분 되돌리기 (발생분 remaining 복구 + CompDayUse 삭제)"""
+    uses = CompDayUse.objects.filter(leave_request_id=leave_request_id)
+    returned = defaultdict(lambda: ZERO)
+    for grant_id, amount in uses.values_list("grant_id", "amount"):
+        returned[grant_id] += amount
+    if not returned:
+        return
+    for grant_id, amount in returned.items():
+        CompDayGrant.objects.filter(pk=grant_id).update(remaining=F("remaining") + amount)
+    uses.delete()
+
+
+def reallocate(leave_year_ids) -> None:
+    """
+    LeaveYear 들의 배분을 처음부터 다시 (bulk 저장 후 / 재계산 작업용)
+    신청을 시작일 순으로 발생분에 FIFO 배분 -> 쿼리 수는 LeaveYear 수와 무관
+    """
+    ids = list(leave_year_ids)
+    if not ids:
+        return
+    CompDayUse.objects.filter(leave_request__leave_year_id__in=ids).delete()
+
+    grants_by_year = defaultdict(list)
+    grants = list(
+        CompDayGrant.objects.filter(leave_year_id__in=ids).order_by("worked_date", "id")
+        .only("id", "leave_year_id", "amount", "remaining")
+    )
+    for g in grants:
+        g.remaining = g.amount
+        grants_by_year[g.leave_year_id].append(g)
+
+    uses = []
+    requests = (
+        LeaveRequest.objects.filter(leave_year_id__in=ids, used_comp__gt=0)
+        .order_by("start_date", "id")
+        .values_list("id", "leave_year_id", "used_comp")
+    )
+    for request_id, leave_year_id, used_comp in requests:
+        need = Decimal(used_comp)
+        for g in grants_by_year.get(leave_year_id, []):
+            if need <= 0:
+                break
+            if g.remaining <= 0:
+                continue
+            take = min(g.remaining, need)
+            g.remaining -= take
+            need -= take
+            uses.append(CompDayUse(leave_request_id=request_id, grant_id=g.id, amount=take))
+
+    CompDayUse.objects.bulk_create(uses, batch_size=500)
+    CompDayGrant.objects.bulk_update(grants, ["remaining"], batch_size=500)
+
+
+def grant_remaining(instance, prev) -> Decimal:
+    """발생분 저장 직전 remaining (새 발생분 = amount, 수량 수정 = 차이만큼)"""
+    amount = Decimal(str(instance.amount or 0))
+    if not prev:
+        return amount
+    return Decimal(prev["remaining"]) + amount - Decimal(prev["amount"])
@@ -0,0 +1,7 @@
+# leaves/context_processors.py
+from . import ledger
+
+
+def balances(request):
+    """템플릿에서 {{ balances.<leave_year_id>.used_comp }} (요청 안에서 재사용)"""
+    return {"balances": ledger.current_memo()}
@@ -0,0 +1,163 @@
+# leaves/holiday_table.py
+"""
+공휴일 테이블 (프로세스 전역)
+- 년도별 {date: 한글이름} 을 한 번만 만들어서 재사용 (요청마다 holidays.KR 생성 X)
+- 관리자 등록분(CompanyHoliday)으로 추가/제외 가능 (회사 휴무일, 라이브러리에 없는 선거일 등)
+- 달력 이벤트 / 영업일 계산 등 어디서든 사용
+"""
+import hashlib
+import threading
+import time
+from datetime import date
+
+import holidays
+from django.conf import settings
+
+# 관리자 등록분은 다른 워커에서 바뀔 수 있으므로 일정 시간마다 다시 읽음(초)
+HOLIDAY_OVERRIDE_TTL = getattr(settings, "HOLIDAY_OVERRIDE_TTL", 60)
+
+KR_HOLIDAY_KO = {
+    "New Year's Day": "신정",
+    "Korean New Year": "설날",
+    "The day preceding Korean New Year": "설날 연휴",
+    "The second day of Korean New Year": "설날 연휴",
+    "Independence Movement Day": "삼일절",
+    "Children's Day": "어린이날",
+    "Buddha's Birthday": "부처님오신날",
+    "Memorial Day": "현충일",
+    "Liberation Day": "광복절",
+    "Chuseok": "추석",
+    "The day preceding Chuseok": "추석 연휴",
+    "The second day of Chuseok": "추석 연휴",
+    "National Foundation Day": "개천절",
+    "Hangul Day": "한글날",
+    "Christmas Day": "성탄절",
+    "Alternative holiday": "대체공휴일",
+    "Local Election Day": "지방선거일",
+    "Election Day": "선거일",  # 라이브러리에서 나오는 경우 대비
+}
+
+
+def to_ko_holiday_name(en: str) -> str:
+    if not en:
+        return ""
+    s = str(en).strip()
+
+    # 같은 날 공휴일이 여러 개면 "A; B" 로 붙어서 나옴
+    if "; " in s:
+        return ", ".join(to_ko_holiday_name(x) for x in s.split("; "))
+
+    # 대체공휴일 같이 "Alternative holiday for X" 형태가 나올 수 있어 처리
+    if s.lower().startswith("alternative holiday"):
+        # "Alternative holiday for Chuseok" -> "대체공휴일(추석)"
+        if " for " in s:
+            base = s.split(" for ", 1)[1].strip()
+            base_ko = KR_HOLIDAY_KO.get(base, base)
+            return f"대체공휴일({base_ko})"
+        return "대체공휴일"
+
+    return KR_HOLIDAY_KO.get(s, s)  # 매핑 없으면 원문 유지
+
+
+_lock = threading.Lock()
+_library_years = {}      # {year: {date: name}}  라이브러리 결과(한글 변환 완료), 불변
+_merged_years = {}       # {year: {date: name}}  관리자 등록분 반영
+_overrides = None        # {date: (name, is_off)}
+_overrides_version = ""  # _overrides 내용 해시 (달력 월 캐시 키에 포함)
+_overrides_loaded_at = 0.0
+
+
+def _build_library_year(year: int) -> dict:
+    kr = holidays.KR(years=year)
+    return {d: to_ko_holiday_name(name) for d, name in sorted(kr.items())}
+
+
+def _library_year(year: int) -> dict:
+    table = _library_years.get(year)
+    if table is None:
+        table = _build_library_year(year)
+        with _lock:
+            _library_years.setdefault(year, table)
+    return table
+
+
+def _load_overrides() -> dict:
+    from .models import CompanyHoliday  # 지연 import
+    return {
+        d: (name, is_off)
+        for d, name, is_off in CompanyHoliday.objects.values_list("date", "name", "is_off")
+    }
+
+
+def _current_overrides() -> dict:
+    global _overrides, _overrides_version, _overrides_loaded_at
+    now = time.monotonic()
+    if _overrides is None or now - _overrides_loaded_at > HOLIDAY_OVERRIDE_TTL:
+        overrides = _load_overrides()
+        with _lock:
+            if overrides != _overrides:
+                _merged_years.clear()
+                _overrides_version = hashlib.md5(repr(sorted(overrides.items())).encode()).hexdigest()[:12]
+            _overrides = overrides
+            _overrides_loaded_at = now
+    return _overrides
+
+
+def overrides_version() -> str:
+    """
+    이 프로세스가 쓰는 관리자 등록분의 버전
+    - 공휴일 월 캐시 키에 넣음 -> 등록분을 아직 다시 읽지 않은 워커가 만든 버킷을 다른 워커가 쓰지 않음
+    """
+    _current_overrides()
+    return _overrides_version
+
+
+def year_table(year: int) -> dict:
+    """{date: 한글 공휴일명} (관리자 추가/제외 반영). 반환값은 수정하지 말 것"""
+    overrides = _current_overrides()
+    table = _merged_years.get(year)
+    if table is not None:
+        return table
+
+    merged = dict(_library_year(year))
+    for d, (name, is_off) in overrides.items():
+        if d.year != year:
+            continue
+        if is_off:
+            merged[d] = name
+        else:
+            merged.pop(d, None)
+    table = dict(sorted(merged.items()))
+    with _lock:
+        _merged_years[year] = table
+    return table
+
+
+def holidays_between(start: date, end: date):
+    """[start, end) 구간의 (date, 이름) 목록 (날짜순)"""
+    result = []
+    for year in range(start.year, end.year + 1):
+        result.extend((d, name) for d, name in year_table(year).items() if start <= d < end)
+    return result
+
+
+def is_holiday(d: date) -> bool:
+    return d in year_table(d.year)
+
+
+def holiday_name(d: date) -> str:
+    return year_table(d.year).get(d, "")
+
+
+def warm(years) -> None:
+    """라이브러리 공휴일만 미리 계산 (DB 접근 없음 -> AppConfig.ready 에서 호출 가능)"""
+    for year in years:
+        _library_year(year)
+
+
+def invalidate() -> None:
+    """관리자 등록분이 바뀌었을 때 (이 프로세스는 즉시, 다른 워커는 TTL 이후 반영)"""
+    global _overrides
+    with _lock:
+        _overrides = None
+        _merged_years.clear()
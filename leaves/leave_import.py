@@ -0,0 +1,269 @@
+# leaves/leave_import.py
+"""
+휴무 신청 일괄 등록 (엑셀/CSV -> LeaveRequest)
+- 예전 기록 옮길 때 사용 (관리자 업로드 / python manage.py import_leaves)
+- 열: 이름, 종류(연차/반차), 오전오후(반차만), 시작일, 종료일, 사유
+- 검증/차감 계산은 전부 메모리에서 (대체휴무 우선 - 반차는 연차만)
+  저장 뒤 rededuct 와 같은 규칙: 그 년도 기존 신청과 합쳐 시작일 순으로 다시 나눔
+  -> 미리보기 숫자 = 저장되는 숫자 (나눔이 바뀌는 기존 신청도 보고서에 표시)
+- 저장은 한 트랜잭션에서 bulk_create, 집계/배분/점유 비트맵은 한 번에 다시 계산
+- 텔레그램 알림 없음
+- xlsx 는 openpyxl 필요 (없으면 CSV 로 저장해서 올리면 됨)
+"""
+import csv
+import io
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.dateparse import parse_date
+
+from . import comp_alloc, ledger, occupancy, rededuct
+from .business_days import leave_units_batch
+from .calendar_events import bump_calendar_stamp, invalidate_all
+from .models import CompDayGrant, Employee, LeaveRequest, LeaveYear
+
+# 헤더 이름 -> 필드 (한글/영문 둘 다)
+COLUMNS = {
+    "이름": "name", "name": "name",
+    "종류": "leave_type", "leave_type": "leave_type",
+    "오전오후": "half_day", "half_day": "half_day",
+    "시작일": "start_date", "start_date": "start_date",
+    "종료일": "end_date", "end_date": "end_date",
+    "사유": "reason", "reason": "reason",
+}
+LEAVE_TYPES = {"연차": "ANNUAL", "annual": "ANNUAL", "반차": "HALF", "half": "HALF"}
+HALF_DAYS = {"오전": "AM", "am": "AM", "오후": "PM", "pm": "PM"}
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)       # [(줄번호, 메시지)]
+    by_employee: dict = field(default_factory=dict)  # {이름: {"count", "used_comp", "used_annual"}}
+    resplit: list = field(default_factory=list)      # 나눔이 바뀌는 기존 신청 [(이름, 시작일, 예전 대체, 새 대체)]
+    dry_run: bool = False
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def lines(self):
+        mode = "미리보기(저장 안 함)" if self.dry_run else "등록"
+        yield f"{mode}: {self.rows}줄, 저장 {self.created}건, 오류 {len(self.errors)}건"
+        for name, s in sorted(self.by_employee.items()):
+            yield f"- {name}: {s['count']}건 / 대체 {s['used_comp']} / 연차 {s['used_annual']}"
+        for name, start, before, after in self.resplit:
+            yield f"~ 기존 신청 {name} {start}: 대체 {before} -> {after} (더 이른 날짜 신청이 대체휴무를 먼저 씀)"
+        for line_no, msg in self.errors:
+            yield f"! {line_no}줄: {msg}"
+
+
+def read_rows(fileobj, filename: str):
+    """업로드/경로 파일 -> [(줄번호, {필드: 값})]"""
+    if filename.lower().endswith(".xlsx"):
+        try:
+            import openpyxl
+        except ImportError:
+            raise ValueError("xlsx 를 읽으려면 openpyxl 설치가 필요합니다. CSV 로 저장해서 올려주세요.")
+        sheet = openpyxl.load_workbook(fileobj, read_only=True, data_only=True).active
+        records = ([("" if v is None else v) for v in row] for row in sheet.iter_rows(values_only=True))
+    else:
+        raw = fileobj.read()
+        text = raw.decode("utf-8-sig") if isinstance(raw, bytes) else raw
+        records = csv.reader(io.StringIO(text))
+
+    header = None
+    result = []
+    for line_no, record in enumerate(records, start=1):
+        if header is None:
+            header = [COLUMNS.get(str(h).strip().lower(), COLUMNS.get(str(h).strip())) for h in record]
+            continue
+        if not any(str(v).strip() for v in record):
+            continue
+        result.append((line_no, {k: v for k, v in zip(header, record) if k}))
+    return result
+
+
+def _as_date(v):
+    # 엑셀 셀은 datetime 으로 들어옴
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return parse_date(str(v).strip()) if v else None
+
+
+def _parse(line_no, raw, employees, errors):
+    name = str(raw.get("name") or "").strip()
+    emp = employees.get(name)
+    if emp is None:
+        errors.append((line_no, f"직원 없음: {name or '(빈칸)'}"))
+        return None
+    leave_type = LEAVE_TYPES.get(str(raw.get("leave_type") or "연차").strip().lower())
+    if leave_type is None:
+        errors.append((line_no, f"종류는 연차/반차: {raw.get('leave_type')}"))
+        return None
+    raw_end = raw.get("end_date")
+    try:
+        start = _as_date(raw.get("start_date"))
+        end = _as_date(raw_end) if str(raw_end or "").strip() else start   # 빈칸만 하루짜리
+    except ValueError:
+        start = end = None
+    if not start or not end or end < start:
+        errors.append((line_no, "시작일/종료일 확인 (YYYY-MM-DD)"))
+        return None
+    half_day = None
+    if leave_type == "HALF":
+        half_day = HALF_DAYS.get(str(raw.get("half_day") or "").strip().lower())
+        if half_day is None or end != start:
+            errors.append((line_no, "반차는 하루 + 오전/오후 지정"))
+            return None
+    return {
+        "line_no": line_no, "employee": emp, "leave_type": leave_type, "half_day": half_day,
+        "start": start, "end": end, "reason": str(raw.get("reason") or "").strip()[:200],
+    }
+
+
+def _plan_split(items, ly_ids, report):
+    """
+    새 신청(items)의 used_comp/used_annual 을 정하고, 나눔이 바뀌는 기존 신청은 report.resplit 에
+    rededuct 와 같은 순서: (시작일, id) -> 같은 날이면 기존 신청 먼저, 새 신청은 저장 순서
+    기준일(그 년도 새 신청 중 가장 이른 날) 이전 기존 신청은 그대로
+    """
+    by_year = defaultdict(list)
+    for it in items:
+        by_year[(it["employee"].id, it["start"].year)].append(it)
+    existing_ids = [ly_ids[key] for key in by_year if key in ly_ids]
+    granted = dict(
+        CompDayGrant.objects.filter(leave_year_id__in=existing_ids)
+        .values("leave_year_id").annotate(s=Sum("amount")).values_list("leave_year_id", "s")
+    )
+    existing = defaultdict(list)
+    for r in LeaveRequest.objects.filter(leave_year_id__in=existing_ids).order_by("start_date", "id").values(
+        "id", "leave_year_id", "leave_type", "start_date", "used_comp", "used_annual"
+    ):
+        existing[r["leave_year_id"]].append(r)
+
+    for key, new_items in by_year.items():
+        ly_id = ly_ids.get(key)
+        pool = Decimal(granted.get(ly_id) or 0)
+        since = min(it["start"] for it in new_items)
+        rows = [((r["start_date"], 0, r["id"]), r, None) for r in existing.get(ly_id, [])]
+        rows += [((it["start"], 1, n), None, it) for n, it in enumerate(new_items)]
+        for _, old, it in sorted(rows, key=lambda row: row[0]):
+            if old is not None and old["start_date"] < since:
+                pool -= old["used_comp"]
+                continue
+            leave_type = old["leave_type"] if old is not None else it["leave_type"]
+            units = old["used_comp"] + old["used_annual"] if old is not None else it["units"]
+            used_comp = Decimal("0")
+            if leave_type == LeaveRequest.LeaveType.ANNUAL and units >= 1:
+                used_comp = max(Decimal("0"), min(pool, units))
+            pool -= used_comp
+            if it is not None:
+                it["used_comp"] = used_comp
+                it["used_annual"] = units - used_comp
+            elif used_comp != old["used_comp"]:
+                report.resplit.append((new_items[0]["employee"].name, old["start_date"], old["used_comp"], used_comp))
+
+
+def import_rows(rows, dry_run=False) -> ImportReport:
+    """
+    rows: read_rows() 결과
+    오류가 한 줄이라도 있으면 저장하지 않음 (보고서만)
+    """
+    report = ImportReport(rows=len(rows), dry_run=dry_run)
+    names = {str(r.get("name") or "").strip() for _, r in rows}
+    employees = {e.name: e for e in Employee.objects.filter(name__in=names)}
+
+    items = [p for p in (_parse(n, r, employees, report.errors) for n, r in rows) if p]
+    if not items:
+        return report
+    units = leave_units_batch((it["leave_type"], it["start"], it["end"]) for it in items)
+    for it, u in zip(items, units):
+        it["units"] = u
+
+    emp_ids = {it["employee"].id for it in items}
+    years = {y for it in items for y in range(it["start"].year, it["end"].year + 1)}
+
+    # 1) 겹침: 기존 점유 비트맵 + 파일 안끼리 (신청 화면과 같이 반차도 하루 전체로 봄)
+    occupied = occupancy.load_many(emp_ids, years)
+    for it in items:
+        eid = it["employee"].id
+        wanted = occupancy.request_bits(it["leave_type"], it["half_day"], it["start"], it["end"])
+        full = occupancy.span_bits(it["start"], it["end"], occupancy.FULL)
+        if any(occupied[(eid, y)] & b for y, b in full.items()):
+            report.errors.append((it["line_no"], f"{it['employee'].name} {it['start']} 이미 휴무 있음"))
+            it["skip"] = True
+            continue
+        for y, b in wanted.items():
+            occupied[(eid, y)] |= b
+
+    # 2) 대체휴무 우선 차감: 직원/년도별로 기존 신청과 합쳐 시작일 순으로 (저장 뒤 rededuct 와 같은 결과)
+    ly_ids = dict(
+        ((eid, y), ly_id) for ly_id, eid, y in
+        LeaveYear.objects.filter(employee_id__in=emp_ids, year__in=years).values_list("id", "employee_id", "year")
+    )
+    items = [it for it in items if not it.get("skip")]
+    items.sort(key=lambda it: (it["employee"].id, it["start"], it["line_no"]))   # 저장(id) 순서
+    _plan_split(items, ly_ids, report)
+
+    for it in items:
+        s = report.by_employee.setdefault(
+            it["employee"].name, {"count": 0, "used_comp": Decimal("0"), "used_annual": Decimal("0")}
+        )
+        s["count"] += 1
+        s["used_comp"] += it["used_comp"]
+        s["used_annual"] += it["used_annual"]
+
+    if dry_run or report.errors:
+        return report
+
+    # 3) 저장 (한 트랜잭션)
+    with transaction.atomic():
+        missing = {(it["employee"].id, it["start"].year) for it in items} - set(ly_ids)
+        LeaveYear.objects.bulk_create(
+            [LeaveYear(employee_id=eid, year=y, base_days=0, carry_over=0) for eid, y in missing],
+            ignore_conflicts=True,
+        )
+        if missing:
+            ly_ids.update(
+                ((eid, y), ly_id) for ly_id, eid, y in
+                LeaveYear.objects.filter(employee_id__in=emp_ids, year__in=years).values_list("id", "employee_id", "year")
+            )
+        LeaveRequest.objects.bulk_create([
+            LeaveRequest(
+                leave_year_id=ly_ids[(it["employee"].id, it["start"].year)],
+                employee=it["employee"],
+                leave_type=it["leave_type"],
+                half_day=it["half_day"],
+                start_date=it["start"],
+                end_date=it["end"],
+                reason=it["reason"],
+                used_comp=it["used_comp"],
+                used_annual=it["used_annual"],
+            )
+            for it in items
+        ], batch_size=500)
+
+        # bulk_create 는 시그널이 없으므로 집계/배분/점유를 한 번에
+        touched = {ly_ids[(it["employee"].id, it["start"].year)] for it in items}
+        ledger.rebuild_many(touched)
+        comp_alloc.reallocate(touched)
+        # 기존 신청보다 이른 날짜로 들어온 경우 그 이후 신청의 대체/연차 나눔 다시 계산
+        since = {}
+        for it in items:
+            ly_id = ly_ids[(it["employee"].id, it["start"].year)]
+            since[ly_id] = min(since.get(ly_id, it["start"]), it["start"])
+        rededuct.rededuct(since)
+        occupancy.rebuild_many(emp_ids, years)
+        bump_calendar_stamp(*((it["start"], it["end"]) for it in items))
+        transaction.on_commit(invalidate_all)
+
+    report.created = len(items)
+    return report
@@ -0,0 +1,243 @@
+# leaves/ledger.py
+"""
+LeaveBalance(잔여 집계) 유지
+- 발생(CompDayGrant) / 신청(LeaveRequest) 저장·삭제 시 signals.py 에서 증감 호출
+  -> 쓰기와 같은 트랜잭션 (쓰기 경로는 transaction.atomic 안에서 저장)
+- bulk_create / bulk_update / queryset.update 는 시그널이 없으므로 호출한 쪽에서 rebuild() 해야 함
+- 집계 행이 없으면 조회 때는 원본에서 계산만, 증감 때 다시 계산해서 만듦
+- 요청 1건 안에서는 같은 LeaveYear 집계를 한 번만 조회 (BalanceMemo, middleware 에서 켬)
+"""
+import contextvars
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import LeaveBalance, CompDayGrant, LeaveRequest
+
+ZERO = Decimal("0")
+BALANCE_FIELDS = ("comp_granted", "used_comp", "used_annual")
+
+
+class BalanceMemo:
+    """
+    요청 1건 동안 LeaveYear별 집계 행을 보관
+    - 뷰 helper 여러 곳에서 get_balance() 를 불러도 쿼리는 LeaveYear당 1번
+    - 템플릿: {{ balances.<leave_year_id>.used_comp }}
+    - saved: 재사용해서 줄인 쿼리 수 (DEBUG 에서 응답 헤더로 표시)
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.saved = 0
+
+    def get(self, leave_year_id):
+        balance = self.rows.get(leave_year_id)
+        if balance is not None:
+            self.saved += 1
+            return balance
+        balance = _load(leave_year_id)
+        self.rows[leave_year_id] = balance
+        return balance
+
+    def forget(self, leave_year_id):
+        self.rows.pop(leave_year_id, None)
+
+    def __getitem__(self, key):
+        # 템플릿 변수 조회는 문자열 키로 들어옴
+        return self.get(int(key))
+
+
+_memo = contextvars.ContextVar("leave_balance_memo", default=None)
+
+
+@contextmanager
+def request_memo():
+    """이 블록 안의 get_balance() 는 BalanceMemo 를 거침"""
+    memo = BalanceMemo()
+    token = _memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _memo.reset(token)
+
+
+def current_memo():
+    return _memo.get()
+
+
+def _forget(leave_year_id) -> None:
+    memo = _memo.get()
+    if memo is not None:
+        memo.forget(leave_year_id)
+
+
+def to_decimal(v) -> Decimal:
+    # 뷰에서 float 로 저장하는 경우가 있어서 문자열 거쳐 변환 (0.1 오차 방지)
+    if isinstance(v, Decimal):
+        return v
+    return Decimal(str(v or 0))
+
+
+def compute(leave_year_id) -> dict:
+    """원본 행에서 직접 합계 계산"""
+    comp_granted = CompDayGrant.objects.filter(leave_year_id=leave_year_id).aggregate(s=Sum("amount"))["s"]
+    used = LeaveRequest.objects.filter(leave_year_id=leave_year_id).aggregate(
+        c=Sum("used_comp"), a=Sum("used_annual")
+    )
+    return {
+        "comp_granted": Decimal(comp_granted or 0),
+        "used_comp": Decimal(used["c"] or 0),
+        "used_annual": Decimal(used["a"] or 0),
+    }
+
+
+def rebuild(leave_year_id) -> LeaveBalance:
+    """해당 LeaveYear 집계를 원본 기준으로 다시 저장"""
+    values = compute(leave_year_id)
+    balance, created = LeaveBalance.objects.update_or_create(leave_year_id=leave_year_id, defaults=values)
+    if not created:
+        LeaveBalance.objects.filter(leave_year_id=leave_year_id).update(version=F("version") + 1)
+        balance.version += 1
+    _forget(leave_year_id)
+    return balance
+
+
+def rebuild_many(leave_year_ids) -> None:
+    """여러 LeaveYear 집계를 한 번에 다시 계산 (bulk 저장 후). 원본 합계 2쿼리 + 저장"""
+    ids = list(leave_year_ids)
+    if not ids:
+        return
+    granted = dict(
+        CompDayGrant.objects.filter(leave_year_id__in=ids)
+        .values("leave_year_id").annotate(s=Sum("amount")).values_list("leave_year_id", "s")
+    )
+    used = {
+        r["leave_year_id"]: r
+        for r in LeaveRequest.objects.filter(leave_year_id__in=ids)
+        .values("leave_year_id").annotate(c=Sum("used_comp"), a=Sum("used_annual"))
+    }
+    rows = [
+        LeaveBalance(
+            leave_year_id=ly_id,
+            comp_granted=Decimal(granted.get(ly_id) or 0),
+            used_comp=Decimal((used.get(ly_id) or {}).get("c") or 0),
+            used_annual=Decimal((used.get(ly_id) or {}).get("a") or 0),
+        )
+        for ly_id in ids
+    ]
+    existing = set(LeaveBalance.objects.filter(leave_year_id__in=ids).values_list("leave_year_id", flat=True))
+    stale = [b for b in rows if b.leave_year_id in existing]
+    for b in stale:
+        b.version = F("version") + 1
+    LeaveBalance.objects.bulk_update(stale, (*BALANCE_FIELDS, "version"), batch_size=500)
+    LeaveBalance.objects.bulk_create([b for b in rows if b.leave_year_id not in existing], batch_size=500)
+    for ly_id in ids:
+        _forget(ly_id)
+
+
+def apply_delta(leave_year_id, comp_granted=ZERO, used_comp=ZERO, used_annual=ZERO) -> None:
+    """
+    증감 반영 (F() 로 DB 에서 더함 -> 동시 쓰기에도 안전)
+    집계 행이 없으면 원본에서 새로 계산 (이미 저장된 변경이 포함되므로 증감은 생략)
+    """
+    if not leave_year_id:
+        return
+    delta = {"comp_granted": comp_granted, "used_comp": used_comp, "used_annual": used_annual}
+    delta = {k: to_decimal(v) for k, v in delta.items() if v}
+    if not delta:
+        return
+
+    _forget(leave_year_id)   # 이 요청에서 이미 읽은 값은 버림
+    updated = LeaveBalance.objects.filter(leave_year_id=leave_year_id).update(
+        **{k: F(k) + v for k, v in delta.items()}, version=F("version") + 1
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                rebuild(leave_year_id)
+        except IntegrityError:
+            # 다른 요청이 먼저 만들었음 -> 그 행에 증감
+            LeaveBalance.objects.filter(leave_year_id=leave_year_id).update(
+                **{k: F(k) + v for k, v in delta.items()}, version=F("version") + 1
+            )
+
+
+def compare_and_apply(leave_year_id, expected: dict, comp_granted=ZERO, used_comp=ZERO, used_annual=ZERO) -> bool:
+    """
+    낙관적 동시성: 집계 행 version 이 expected["version"](읽었을 때 값) 그대로일 때만 증감 -> 성공 여부
+    (합계 비교 X: 0일 신청은 합계가 그대로라서 동시 신청을 못 걸러냄)
+    실패(False) = 그 사이 다른 요청이 같은 LeaveYear 를 바꿈 -> 호출한 쪽에서 다시 읽고 재시도
+    이 증감을 반영한 신청은 저장 전에 instance._balance_applied = True (시그널 중복 증감 방지)
+    """
+    delta = {"comp_granted": comp_granted, "used_comp": used_comp, "used_annual": used_annual}
+    _forget(leave_year_id)
+    updated = LeaveBalance.objects.filter(leave_year_id=leave_year_id, version=expected["version"]).update(
+        **{k: F(k) + to_decimal(v) for k, v in delta.items()}, version=F("version") + 1
+    )
+    return bool(updated)
+
+
+def _load(leave_year_id) -> LeaveBalance:
+    balance = LeaveBalance.objects.filter(pk=leave_year_id).first()
+    if balance is None:
+        # 조회 중에는 쓰지 않음 (다음 증감 때 또는 rebuild_balances 로 저장)
+        balance = LeaveBalance(leave_year_id=leave_year_id, **compute(leave_year_id))
+    return balance
+
+
+def get_balance(leave_year) -> LeaveBalance:
+    """
+    잔여 집계 1행 (PK 조회). 요청 안에서는 한 번만 조회
+    - 행이 없으면 원본에서 계산한 값 (저장 X)
+    - 저장 안 된 LeaveYear(services.empty_leave_year) -> 쿼리 없이 0
+    """
+    leave_year_id = getattr(leave_year, "pk", leave_year)
+    if leave_year_id is None:
+        return LeaveBalance(**{k: Decimal("0.0") for k in BALANCE_FIELDS})
+    memo = _memo.get()
+    if memo is not None:
+        return memo.get(leave_year_id)
+    return _load(leave_year_id)
+
+
+def verify(leave_year_ids=None):
+    """
+    집계와 원본 비교 -> [(leave_year_id, 저장값|None, 원본값)] 불일치 목록
+    원본 합계는 LeaveYear 수와 무관하게 4쿼리
+    """
+    from .models import LeaveYear  # 순환 import 방지
+
+    ly_qs = LeaveYear.objects.all()
+    grants = CompDayGrant.objects.all()
+    requests = LeaveRequest.objects.all()
+    balances = LeaveBalance.objects.all()
+    if leave_year_ids is not None:
+        ly_qs = ly_qs.filter(id__in=leave_year_ids)
+        grants = grants.filter(leave_year_id__in=leave_year_ids)
+        requests = requests.filter(leave_year_id__in=leave_year_ids)
+        balances = balances.filter(leave_year_id__in=leave_year_ids)
+    ids = list(ly_qs.order_by("id").values_list("id", flat=True))
+
+    granted = dict(
+        grants.values("leave_year_id").annotate(s=Sum("amount")).values_list("leave_year_id", "s")
+    )
+    used = {
+        r["leave_year_id"]: r
+        for r in requests.values("leave_year_id").annotate(c=Sum("used_comp"), a=Sum("used_annual"))
+    }
+    stored = {b["leave_year_id"]: b for b in balances.values("leave_year_id", *BALANCE_FIELDS)}
+
+    mismatches = []
+    for ly_id in ids:
+        expected = {
+            "comp_granted": Decimal(granted.get(ly_id) or 0),
+            "used_comp": Decimal((used.get(ly_id) or {}).get("c") or 0),
+            "used_annual": Decimal((used.get(ly_id) or {}).get("a") or 0),
+        }
+        row = stored.get(ly_id)
+        actual = {k: Decimal(row[k]) for k in BALANCE_FIELDS} if row else None
+        if actual != expected:
+            mismatches.append((ly_id, actual, expected))
+    return mismatches
@@ -0,0 +1,25 @@
+# leaves/management/commands/import_leaves.py
+from django.core.management.base import BaseCommand, CommandError
+
+from leaves.leave_import import import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = "휴무 신청 일괄 등록 (CSV/XLSX). 열: 이름, 종류, 오전오후, 시작일, 종료일, 사유"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV 또는 XLSX 파일")
+        parser.add_argument("--dry-run", action="store_true", help="검증/차감 계산만 하고 저장하지 않음")
+
+    def handle(self, *args, path, dry_run=False, **options):
+        try:
+            with open(path, "rb") as f:
+                rows = read_rows(f, path)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        report = import_rows(rows, dry_run=dry_run)
+        for line in report.lines():
+            self.stdout.write(line)
+        if not report.ok:
+            raise CommandError("오류가 있어 저장하지 않았습니다.")
@@ -0,0 +1,28 @@
+# leaves/management/commands/provision_years.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from leaves.models import Employee
+from leaves.services import ensure_leave_years
+
+
+class Command(BaseCommand):
+    help = "재직 직원의 LeaveYear(년도계정)를 한 번에 생성 (조회 화면은 생성하지 않음)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "years", nargs="*", type=int,
+            help="생성할 년도 (생략 시 올해 + 내년)",
+        )
+
+    def handle(self, *args, years=None, **options):
+        if not years:
+            this_year = timezone.localdate().year
+            years = [this_year, this_year + 1]
+
+        employee_ids = list(Employee.objects.filter(is_active=True).values_list("id", flat=True))
+        for year in years:
+            with transaction.atomic():
+                created = ensure_leave_years(year, employee_ids)
+            self.stdout.write(self.style.SUCCESS(f"{year}년: {created}명 생성"))
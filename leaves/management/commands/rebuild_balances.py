@@ -0,0 +1,36 @@
+# leaves/management/commands/rebuild_balances.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from leaves import ledger
+from leaves.models import LeaveYear
+
+
+class Command(BaseCommand):
+    help = "LeaveBalance(잔여 집계)를 원본(발생/신청)과 비교하고 다르면 다시 계산"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="해당 년도만")
+        parser.add_argument("--check", action="store_true", help="비교만 하고 고치지 않음 (불일치 있으면 종료코드 1)")
+
+    def handle(self, *args, year=None, check=False, **options):
+        ids = None
+        if year:
+            ids = list(LeaveYear.objects.filter(year=year).values_list("id", flat=True))
+
+        mismatches = ledger.verify(ids)
+        for ly_id, actual, expected in mismatches:
+            self.stdout.write(f"LeaveYear #{ly_id}: 저장 {actual} / 원본 {expected}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("불일치 없음"))
+            return
+
+        if check:
+            self.stderr.write(self.style.ERROR(f"불일치 {len(mismatches)}건"))
+            raise SystemExit(1)
+
+        with transaction.atomic():
+            for ly_id, _, _ in mismatches:
+                ledger.rebuild(ly_id)
+        self.stdout.write(self.style.SUCCESS(f"{len(mismatches)}건 다시 계산"))
@@ -0,0 +1,31 @@
+# leaves/management/commands/send_notifications.py
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from leaves import outbox
+
+
+class Command(BaseCommand):
+    help = "보낼 함(Notification)의 텔레그램 알림 전달 (기본: 계속 실행, --once: 한 번만)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="지금 보낼 차례인 것만 보내고 종료")
+        parser.add_argument(
+            "--interval", type=float, default=outbox.OUTBOX_POLL_SECONDS,
+            help="확인 간격(초)",
+        )
+
+    def handle(self, *args, once=False, interval=None, **options):
+        if once:
+            sent, retried, failed = outbox.deliver_due(limit=1000)
+            self.stdout.write(self.style.SUCCESS(f"전송 {sent} / 재시도 예약 {retried} / 포기 {failed}"))
+            return
+
+        # SIGTERM/SIGINT -> 지금 보내는 것까지 마치고 종료
+        stop = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: stop.set())
+        self.stdout.write(f"알림 전달 워커 시작 ({interval}초 간격)")
+        outbox.run_worker(stop_event=stop, poll_seconds=interval)
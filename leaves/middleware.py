@@ -1,7 +1,20 @@
 # leaves/middleware.py
+"""
+공용 미들웨어 (동기 / async 둘 다 지원)
+- async 뷰(ASGI) 앞에서 스레드로 바꾸지 않도록 async 경로(__acall__)를 따로 둠
+- DB 쓰기(방문자/측정값 반영)는 async 경로에서 sync_to_async 로
+"""
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import F
-from .models import VisitorStat
+from . import ledger
+from . import visitor_counter
+from . import view_metrics
+
+logger = logging.getLogger(__name__)
 
 EXCLUDE_PATH_PREFIXES = (
     "/static/",
@@ -14,16 +27,106 @@ EXCLUDE_PATH_PREFIXES = (
     "/leave/static/",
 )
 
-class VisitorCountMiddleware:
+def _visitor_key(request) -> str:
+    # 고유 방문자 구분용 (IP + 브라우저). 해시만 스케치에 들어가고 원래 값은 저장 안 함
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    ip = forwarded.split(",")[0].strip() or request.META.get("REMOTE_ADDR", "")
+    return f"{ip}|{request.META.get('HTTP_USER_AGENT', '')}"
+
+
+class _SyncAsyncMiddleware:
+    """get_response 가 async 면 __acall__ 로 (Django 미들웨어 sync/async 겸용 규칙)"""
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        path = request.path
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
 
-        if not path.startswith(EXCLUDE_PATH_PREFIXES):
-            today = timezone.localdate()
-            obj, _ = VisitorStat.objects.get_or_create(date=today)
-            VisitorStat.objects.filter(pk=obj.pk).update(count=F("count") + 1)
 
+class VisitorCountMiddleware(_SyncAsyncMiddleware):
+    """방문 수 / 고유 방문자 스케치는 메모리에 모았다가 한 번에 반영 (visitor_counter)"""
+
+    def _hit(self, request) -> bool:
+        if request.path.startswith(EXCLUDE_PATH_PREFIXES):
+            return False
+        return visitor_counter.hit(timezone.localdate(), _visitor_key(request))
+
+    def handle(self, request):
+        if self._hit(request):
+            visitor_counter.flush()
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self._hit(request):
+            await sync_to_async(visitor_counter.flush)()
+        return await self.get_response(request)
+
+
+class BalanceMemoMiddleware(_SyncAsyncMiddleware):
+    """
+    요청 1건 동안 LeaveYear 잔여 집계를 한 번만 조회 (ledger.BalanceMemo)
+    DEBUG 면 줄인 쿼리 수를 X-Balance-Queries-Saved 헤더 + 로그로 표시
+    (contextvar 라 async 뷰의 sync_to_async 스레드에도 같은 memo 가 보임)
+    """
+
+    def _report(self, request, response, memo):
+        if settings.DEBUG and memo.rows:
+            response["X-Balance-Queries-Saved"] = str(memo.saved)
+            logger.debug("%s 잔여 집계 %d건 조회, %d쿼리 절약", request.path, len(memo.rows), memo.saved)
+        return response
+
+    def handle(self, request):
+        with ledger.request_memo() as memo:
+            response = self.get_response(request)
+        return self._report(request, response, memo)
+
+    async def __acall__(self, request):
+        with ledger.request_memo() as memo:
+            response = await self.get_response(request)
+        return self._report(request, response, memo)
+
+
+class ViewMetricsMiddleware(_SyncAsyncMiddleware):
+    """
+    뷰 이름별 응답 시간 / DB 시간 / 쿼리 수 기록 (view_metrics, manage/metrics/ 에서 확인)
+    MIDDLEWARE 맨 앞에 두면 다른 미들웨어 시간까지 포함
+    """
+
+    @staticmethod
+    def _skip(request):
+        return request.path.startswith(("/static/", "/leave/static/", "/favicon.ico"))
+
+    @staticmethod
+    def _record(request, response, started, db) -> bool:
+        match = getattr(request, "resolver_match", None)
+        if match is None:   # 404 등 URL 이 안 맞은 요청은 제외
+            return False
+        wall_ms = (time.perf_counter() - started) * 1000
+        return view_metrics.record(match.view_name, wall_ms, db["ms"], db["queries"], response.status_code)
+
+    def handle(self, request):
+        if self._skip(request):
+            return self.get_response(request)
+        started = time.perf_counter()
+        with view_metrics.track_db() as db:
+            response = self.get_response(request)
+        if self._record(request, response, started, db):
+            view_metrics.flush()
+        return response
+
+    async def __acall__(self, request):
+        if self._skip(request):
+            return await self.get_response(request)
+        started = time.perf_counter()
+        with view_metrics.track_db() as db:
+            response = await self.get_response(request)
+        if self._record(request, response, started, db):
+            await sync_to_async(view_metrics.flush)()
+        return response
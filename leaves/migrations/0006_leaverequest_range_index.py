@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0005_visitorstat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['start_date', 'end_date'], name='leaves_leav_start_d_96457d_idx'),
+        ),
+    ]
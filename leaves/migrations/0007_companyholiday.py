@@ -0,0 +1,24 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0006_leaverequest_range_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyHoliday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('is_off', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
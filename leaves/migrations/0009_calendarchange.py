@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0008_calendarstamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('added', '추가'), ('changed', '수정'), ('removed', '삭제')], max_length=10)),
+                ('event_id', models.CharField(max_length=30)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('event', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='leaves_cale_created_890731_idx')],
+            },
+        ),
+    ]
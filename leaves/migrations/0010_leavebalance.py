@@ -0,0 +1,50 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_balances(apps, schema_editor):
+    LeaveYear = apps.get_model("leaves", "LeaveYear")
+    LeaveBalance = apps.get_model("leaves", "LeaveBalance")
+    CompDayGrant = apps.get_model("leaves", "CompDayGrant")
+    LeaveRequest = apps.get_model("leaves", "LeaveRequest")
+
+    granted = dict(
+        CompDayGrant.objects.values("leave_year_id").annotate(s=Sum("amount")).values_list("leave_year_id", "s")
+    )
+    used = {
+        row["leave_year_id"]: row
+        for row in LeaveRequest.objects.values("leave_year_id").annotate(c=Sum("used_comp"), a=Sum("used_annual"))
+    }
+    LeaveBalance.objects.bulk_create([
+        LeaveBalance(
+            leave_year_id=ly_id,
+            comp_granted=granted.get(ly_id) or 0,
+            used_comp=(used.get(ly_id) or {}).get("c") or 0,
+            used_annual=(used.get(ly_id) or {}).get("a") or 0,
+        )
+        for ly_id in LeaveYear.objects.values_list("id", flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0009_calendarchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveBalance',
+            fields=[
+                ('leave_year', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='leaves.leaveyear')),
+                ('comp_granted', models.DecimalField(decimal_places=1, default=0, max_digits=6)),
+                ('used_comp', models.DecimalField(decimal_places=1, default=0, max_digits=6)),
+                ('used_annual', models.DecimalField(decimal_places=1, default=0, max_digits=6)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:20
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def allocate_existing(apps, schema_editor):
+    """기존 신청의 used_comp 를 발생분에 근무일 순(FIFO)으로 배분 -> CompDayUse + remaining"""
+    CompDayGrant = apps.get_model("leaves", "CompDayGrant")
+    CompDayUse = apps.get_model("leaves", "CompDayUse")
+    LeaveRequest = apps.get_model("leaves", "LeaveRequest")
+
+    already = dict(CompDayUse.objects.values("grant_id").annotate(s=Sum("amount")).values_list("grant_id", "s"))
+    grants_by_year = defaultdict(list)
+    grants = list(CompDayGrant.objects.order_by("worked_date", "id"))
+    for g in grants:
+        g.remaining = Decimal(g.amount) - Decimal(already.get(g.id) or 0)
+        grants_by_year[g.leave_year_id].append(g)
+
+    uses = []
+    requests = (
+        LeaveRequest.objects.filter(used_comp__gt=0, comp_uses__isnull=True)
+        .order_by("start_date", "id")
+        .values_list("id", "leave_year_id", "used_comp")
+    )
+    for request_id, leave_year_id, used_comp in requests:
+        need = Decimal(used_comp)
+        for g in grants_by_year.get(leave_year_id, []):
+            if need <= 0:
+                break
+            if g.remaining <= 0:
+                continue
+            take = min(g.remaining, need)
+            g.remaining -= take
+            need -= take
+            uses.append(CompDayUse(leave_request_id=request_id, grant_id=g.id, amount=take))
+
+    CompDayUse.objects.bulk_create(uses, batch_size=500)
+    CompDayGrant.objects.bulk_update(grants, ["remaining"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0010_leavebalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compdaygrant',
+            name='remaining',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=4),
+        ),
+        migrations.AddIndex(
+            model_name='compdaygrant',
+            index=models.Index(condition=models.Q(('remaining__gt', 0)), fields=['leave_year', 'worked_date', 'id'], name='compgrant_open_fifo_idx'),
+        ),
+        migrations.RunPython(allocate_existing, migrations.RunPython.noop),
+    ]
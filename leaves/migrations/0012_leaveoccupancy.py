@@ -0,0 +1,54 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:22
+
+from collections import defaultdict
+from datetime import date
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_occupancy(apps, schema_editor):
+    """기존 신청으로 직원 x 년도 점유 비트맵 생성 (하루 2비트: 오전 1 / 오후 2)"""
+    LeaveRequest = apps.get_model("leaves", "LeaveRequest")
+    LeaveOccupancy = apps.get_model("leaves", "LeaveOccupancy")
+
+    bits = defaultdict(int)
+    rows = LeaveRequest.objects.values_list("employee_id", "leave_type", "half_day", "start_date", "end_date")
+    for employee_id, leave_type, half_day, start, end in rows.iterator():
+        mask = {"AM": 1, "PM": 2}.get(half_day, 3) if leave_type == "HALF" else 3
+        end = end or start
+        for year in range(start.year, end.year + 1):
+            first = max(start, date(year, 1, 1))
+            last = min(end, date(year, 12, 31))
+            days = (last - first).days + 1
+            offset = (first - date(year, 1, 1)).days
+            bits[(employee_id, year)] |= (mask * ((1 << (2 * days)) - 1) // 3) << (2 * offset)
+
+    LeaveOccupancy.objects.bulk_create([
+        LeaveOccupancy(employee_id=employee_id, year=year, bits=b.to_bytes((b.bit_length() + 7) // 8, "little"))
+        for (employee_id, year), b in bits.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0011_compdaygrant_remaining'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('bits', models.BinaryField(default=b'')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='leaves.employee')),
+            ],
+            options={
+                'unique_together': {('employee', 'year')},
+            },
+        ),
+        migrations.RunPython(fill_occupancy, migrations.RunPython.noop),
+    ]
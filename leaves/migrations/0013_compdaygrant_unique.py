@@ -0,0 +1,119 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:25
+
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+# migrate 는 verbosity 를 RunPython 에 넘기지 않으므로 출력 대신 로그 (LOGGING 설정을 따름)
+logger = logging.getLogger("leaves.migrations")
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    같은 (LeaveYear, 근무일, 공휴일명) 발생이 여러 개면 첫 번째만 남김 (일괄 등록 중복 제출분)
+    - 합친 묶음은 하나씩 로그 (지워진 발생 id / 수량)
+    - 발생 합계가 줄어드므로 해당 LeaveYear 는 대체휴무 우선 규칙을 처음부터 다시 적용
+      (leaves/rededuct.py 와 같은 규칙) -> FIFO 배분 / remaining / 잔여 집계 다시 계산
+    """
+    CompDayGrant = apps.get_model("leaves", "CompDayGrant")
+
+    groups = list(
+        CompDayGrant.objects.values("leave_year_id", "worked_date", "holiday_name")
+        .annotate(n=Count("id"), keep=Min("id"))
+        .filter(n__gt=1)
+        .order_by("leave_year_id", "worked_date")
+    )
+    if not groups:
+        return
+
+    logger.warning("중복 대체휴무 발생 %s묶음 합치기", len(groups))
+    touched_years = set()
+    for g in groups:
+        dupes = CompDayGrant.objects.filter(
+            leave_year_id=g["leave_year_id"], worked_date=g["worked_date"], holiday_name=g["holiday_name"]
+        ).exclude(id=g["keep"])
+        removed = list(dupes.values_list("id", "amount"))
+        logger.warning(
+            "LeaveYear %s %s %s: #%s 유지, 삭제 %s",
+            g["leave_year_id"], g["worked_date"], g["holiday_name"] or "-", g["keep"],
+            ", ".join(f"#{pk}(+{amount})" for pk, amount in removed),
+        )
+        dupes.delete()   # 배분(CompDayUse)도 같이 삭제 -> 아래에서 다시 배분
+        touched_years.add(g["leave_year_id"])
+
+    _rededuct(apps, touched_years)
+
+
+def _rededuct(apps, leave_year_ids):
+    """LeaveYear 들의 대체/연차 나눔 + FIFO 배분 + 잔여 집계를 원본 기준으로 다시"""
+    CompDayGrant = apps.get_model("leaves", "CompDayGrant")
+    CompDayUse = apps.get_model("leaves", "CompDayUse")
+    LeaveRequest = apps.get_model("leaves", "LeaveRequest")
+    LeaveBalance = apps.get_model("leaves", "LeaveBalance")
+    ids = list(leave_year_ids)
+
+    grants_by_year = defaultdict(list)
+    grants = list(CompDayGrant.objects.filter(leave_year_id__in=ids).order_by("worked_date", "id"))
+    for g in grants:
+        g.remaining = Decimal(g.amount)
+        grants_by_year[g.leave_year_id].append(g)
+    pool = {ly_id: sum((g.remaining for g in grants_by_year[ly_id]), Decimal("0")) for ly_id in ids}
+
+    CompDayUse.objects.filter(leave_request__leave_year_id__in=ids).delete()
+    changed, uses = [], []
+    requests = list(LeaveRequest.objects.filter(leave_year_id__in=ids).order_by("start_date", "id"))
+    for r in requests:
+        units = Decimal(r.used_comp) + Decimal(r.used_annual)
+        used_comp = Decimal("0")
+        if r.leave_type == "ANNUAL" and units >= 1:
+            used_comp = max(Decimal("0"), min(pool[r.leave_year_id], units))
+        pool[r.leave_year_id] -= used_comp
+        if used_comp != Decimal(r.used_comp):
+            logger.warning(
+                "신청 #%s %s: 대체 %s -> %s, 연차 %s -> %s",
+                r.id, r.start_date, r.used_comp, used_comp, r.used_annual, units - used_comp,
+            )
+            r.used_comp = used_comp
+            r.used_annual = units - used_comp
+            changed.append(r)
+
+        need = used_comp
+        for g in grants_by_year[r.leave_year_id]:
+            if need <= 0:
+                break
+            if g.remaining <= 0:
+                continue
+            take = min(g.remaining, need)
+            g.remaining -= take
+            need -= take
+            uses.append(CompDayUse(leave_request_id=r.id, grant_id=g.id, amount=take))
+
+    LeaveRequest.objects.bulk_update(changed, ["used_comp", "used_annual"], batch_size=500)
+    CompDayUse.objects.bulk_create(uses, batch_size=500)
+    CompDayGrant.objects.bulk_update(grants, ["remaining"], batch_size=500)
+
+    for ly_id in ids:
+        used = LeaveRequest.objects.filter(leave_year_id=ly_id).aggregate(c=Sum("used_comp"), a=Sum("used_annual"))
+        LeaveBalance.objects.update_or_create(leave_year_id=ly_id, defaults={
+            "comp_granted": sum((Decimal(g.amount) for g in grants_by_year[ly_id]), Decimal("0")),
+            "used_comp": used["c"] or 0,
+            "used_annual": used["a"] or 0,
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0012_leaveoccupancy'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='compdaygrant',
+            constraint=models.UniqueConstraint(fields=('leave_year', 'worked_date', 'holiday_name'), name='uniq_compgrant_year_date_holiday'),
+        ),
+    ]
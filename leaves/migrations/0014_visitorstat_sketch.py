@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0013_compdaygrant_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitorstat',
+            name='sketch',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
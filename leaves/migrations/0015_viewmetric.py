@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0014_visitorstat_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('view_name', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('wall_hist', models.JSONField(default=list)),
+                ('db_hist', models.JSONField(default=list)),
+                ('wall_max_ms', models.FloatField(default=0)),
+                ('db_ms', models.FloatField(default=0)),
+                ('queries', models.PositiveIntegerField(default=0)),
+                ('queries_max', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('hour', 'view_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0016_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leavebalance',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-17 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0017_leavebalance_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarstamp',
+            name='month',
+            field=models.DateField(blank=True, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-17 05:01
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0018_calendarstamp_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatRateLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.CharField(max_length=50, unique=True)),
+                ('tokens', models.FloatField(default=0)),
+                ('refilled_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
@@ -46,6 +47,29 @@ class LeaveYear(models.Model):
         return f"{self.employee.name} - {self.year}"
 
 
+class LeaveBalance(models.Model):
+    """
+    LeaveYear 별 잔여 집계 (비정규화)
+    - 발생/신청 저장·삭제와 같은 트랜잭션에서 증감 (leaves/ledger.py, signals.py)
+    - 잔여 조회는 이 한 행만 읽으면 됨
+    - 검증/재계산: python manage.py rebuild_balances
+    """
+    leave_year = models.OneToOneField(LeaveYear, on_delete=models.CASCADE, primary_key=True, related_name="balance")
+
+    comp_granted = models.DecimalField(max_digits=6, decimal_places=1, default=0)  # CompDayGrant.amount 합
+    used_comp = models.DecimalField(max_digits=6, decimal_places=1, default=0)     # LeaveRequest.used_comp 합
+    used_annual = models.DecimalField(max_digits=6, decimal_places=1, default=0)   # LeaveRequest.used_annual 합
+
+    # 바뀔 때마다 +1 (ledger.compare_and_apply 가 읽었을 때 값과 비교)
+    # - 합계만 비교하면 0일 신청(주말만 고른 기간 등)은 값이 안 바뀌어서 동시 신청이 둘 다 통과
+    version = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.leave_year} 발생 {self.comp_granted} / 사용 {self.used_comp}+{self.used_annual}"
+
+
 class CompDayGrant(models.Model):
     """
     대체휴무 발생(공휴일 근무로 발생)
@@ -63,11 +87,26 @@ class CompDayGrant(models.Model):
     )
 
     memo = models.CharField(max_length=200, blank=True)
+    # 아직 쓰지 않은 양 (CompDayUse 로 배분될 때 차감, leaves/comp_alloc.py)
+    remaining = models.DecimalField(max_digits=4, decimal_places=1, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["worked_date"]),
+            # 남은 발생분만 근무일 순으로 (다음 배분 대상 바로 찾기)
+            models.Index(
+                fields=["leave_year", "worked_date", "id"],
+                condition=models.Q(remaining__gt=0),
+                name="compgrant_open_fifo_idx",
+            ),
+        ]
+        constraints = [
+            # 같은 날 같은 공휴일 발생은 한 번만 (일괄 등록 중복 제출 방지, 다시 등록하면 수량/메모 갱신)
+            models.UniqueConstraint(
+                fields=["leave_year", "worked_date", "holiday_name"],
+                name="uniq_compgrant_year_date_holiday",
+            ),
         ]
 
     def __str__(self):
@@ -116,6 +155,8 @@ class LeaveRequest(models.Model):
             models.Index(fields=["start_date"]),
             models.Index(fields=["end_date"]),
             models.Index(fields=["employee", "start_date"]),
+            # ✅ 달력 기간 겹침 조회용 (start_date < end AND end_date >= start)
+            models.Index(fields=["start_date", "end_date"]),
         ]
 
     def __str__(self):
@@ -142,6 +183,24 @@ class CompDayUse(models.Model):
             models.Index(fields=["grant"]),
         ]
 
+class LeaveOccupancy(models.Model):
+    """
+    직원 x 년도 휴무 점유 비트맵 (하루 2칸: 오전/오후, 1월 1일부터)
+    - 신청 저장/삭제 때 같이 갱신 (leaves/occupancy.py, signals.py)
+    - 중복 신청 확인 = 비트 AND (신청 목록 조회 X)
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="occupancy")
+    year = models.PositiveIntegerField()
+    bits = models.BinaryField(default=b"")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("employee", "year")
+
+    def __str__(self):
+        return f"{self.employee.name} - {self.year} 점유"
+
+
 class CalendarMemo(models.Model):
     memo_date = models.DateField(db_index=True)
     title = models.CharField(max_length=60, default="메모")
@@ -168,6 +227,131 @@ class CalendarMemo(models.Model):
 class VisitorStat(models.Model):
     date = models.DateField(unique=True)
     count = models.PositiveIntegerField(default=0)
+    # 고유 방문자 HyperLogLog 스케치 (4KB 고정, leaves/hll.py)
+    sketch = models.BinaryField(default=b"", editable=False)
 
     def __str__(self):
         return f"{self.date}: {self.count}"
+
+
+class ViewMetric(models.Model):
+    """
+    뷰별 응답 시간 측정 (시간 단위 합계, leaves/view_metrics.py)
+    - *_hist: view_metrics.BUCKETS_MS 구간별 요청 수
+    """
+    hour = models.DateTimeField()
+    view_name = models.CharField(max_length=100)
+
+    count = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)   # 5xx 응답
+    wall_hist = models.JSONField(default=list)
+    db_hist = models.JSONField(default=list)
+    wall_max_ms = models.FloatField(default=0)
+    db_ms = models.FloatField(default=0)              # DB 시간 합
+    queries = models.PositiveIntegerField(default=0)  # 쿼리 수 합
+    queries_max = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("hour", "view_name")
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}시 {self.view_name} {self.count}건"
+
+
+class CompanyHoliday(models.Model):
+    """
+    공휴일 관리자 보정
+    - is_off=True : 휴무일로 추가 (회사 휴무일, 라이브러리에 없는 선거일 등)
+    - is_off=False: 라이브러리 공휴일을 휴무일에서 제외
+    """
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+    is_off = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        label = self.name if self.is_off else f"{self.name} (제외)"
+        return f"{self.date} {label}"
+
+
+class CalendarStamp(models.Model):
+    """
+    달력 변경 카운터
+    - month 가 있는 행: 그 달에 걸친 휴무/메모/공휴일 보정이 바뀔 때 seq 증가 (삭제, 다른 달로 이동 포함)
+    - month 가 없는 행(1개): 어느 달인지 모르는 변경 (직원 이름 변경, 일괄 등록)
+    - events_api 의 ETag/Last-Modified 계산에 사용 (요청 기간의 달 + 전체 행만 봄)
+    """
+    month = models.DateField(null=True, blank=True, unique=True)   # 그 달 1일
+    seq = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"calendar {self.month:%Y-%m} seq={self.seq}" if self.month else f"calendar seq={self.seq}"
+
+
+class CalendarChange(models.Model):
+    """
+    달력 변경 알림 로그 (SSE / long-poll 로 열린 달력에 전달)
+    - id 가 곧 순번(seq), 클라이언트는 마지막으로 받은 id 이후만 요청
+    - 오래된 행은 주기적으로 삭제
+    """
+    class Action(models.TextChoices):
+        ADDED = "added", "추가"
+        CHANGED = "changed", "수정"
+        REMOVED = "removed", "삭제"
+
+    action = models.CharField(max_length=10, choices=Action.choices)
+    event_id = models.CharField(max_length=30)            # 달력 이벤트 id (예: "12", "memo-3")
+    start_date = models.DateField()
+    end_date = models.DateField()                         # exclusive
+    event = models.JSONField(null=True, blank=True)       # 추가/수정 시 이벤트 데이터
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.event_id}"
+
+
+class Notification(models.Model):
+    """
+    알림 보낼 함 (outbox, leaves/outbox.py)
+    - 신청 저장과 같은 트랜잭션에서 기록 -> 워커가 텔레그램으로 전달 (실패하면 간격 늘려서 재시도)
+    - 신청 화면은 외부 API 응답을 기다리지 않음
+    """
+    class Status(models.TextChoices):
+        PENDING = "pending", "대기"
+        SENT = "sent", "전송"
+        FAILED = "failed", "실패"
+
+    chat_id = models.CharField(max_length=50, blank=True)   # 비우면 settings.TELEGRAM_CHAT_ID
+    text = models.TextField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.CharField(max_length=300, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_status_display()} {self.text[:30]}"
+
+
+class ChatRateLimit(models.Model):
+    """
+    텔레그램 채팅방별 전송 토큰 버킷 (leaves/outbox.py)
+    - DB 에 두므로 웹 프로세스 스레드 / send_notifications 워커가 여러 개여도 합쳐서 제한
+    - refilled_at 이 미래 = 429 retry_after 로 쉬는 중
+    """
+    chat_id = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField(default=0)
+    refilled_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.chat_id or '(기본)'} tokens={self.tokens:.2f}"
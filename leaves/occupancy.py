@@ -0,0 +1,153 @@
+# leaves/occupancy.py
+"""
+직원 x 년도 휴무 점유 비트맵 (LeaveOccupancy)
+- 하루 2비트: 오전(1) / 오후(2), 1월 1일 = 0번째 날
+- 연차(기간)는 날마다 오전+오후, 반차는 해당 칸만 (is_off 로 오전/오후 구분 조회)
+- 중복 신청 확인은 기존 규칙 그대로 날짜 단위: 그날 어느 칸이든 차 있으면 겹침
+  (오전 반차 + 오후 반차도 같은 날이면 거절)
+- 신청 저장은 OR, 수정/삭제는 해당 년도를 원본에서 다시 계산 (겹친 옛 신청이 있어도 안전)
+- bulk 작업(시그널 없음)은 호출한 쪽에서 rebuild() 해야 함
+"""
+from datetime import date
+
+from .models import LeaveOccupancy, LeaveRequest
+
+AM, PM = 1, 2
+FULL = AM | PM
+
+
+def slot_mask(leave_type, half_day) -> int:
+    if leave_type == LeaveRequest.LeaveType.HALF:
+        return {LeaveRequest.HalfDay.AM: AM, LeaveRequest.HalfDay.PM: PM}.get(half_day, FULL)
+    return FULL
+
+
+def span_bits(start: date, end: date, mask: int = FULL) -> dict:
+    """start~end(포함) -> {year: 비트}"""
+    result = {}
+    for year in range(start.year, end.year + 1):
+        first = max(start, date(year, 1, 1))
+        last = min(end, date(year, 12, 31))
+        offset = (first - date(year, 1, 1)).days
+        days = (last - first).days + 1
+        # mask 를 days 번 반복 = mask * (4^days - 1) / 3
+        result[year] = (mask * ((1 << (2 * days)) - 1) // 3) << (2 * offset)
+    return result
+
+
+def request_bits(leave_type, half_day, start: date, end: date) -> dict:
+    return span_bits(start, end or start, slot_mask(leave_type, half_day))
+
+
+def _decode(raw) -> int:
+    return int.from_bytes(bytes(raw or b""), "little")
+
+
+def _encode(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+def compute(employee_id, year: int) -> int:
+    """원본(LeaveRequest)에서 계산"""
+    bits = 0
+    rows = LeaveRequest.objects.filter(
+        employee_id=employee_id, start_date__lte=date(year, 12, 31), end_date__gte=date(year, 1, 1)
+    ).values_list("leave_type", "half_day", "start_date", "end_date")
+    for leave_type, half_day, start, end in rows:
+        bits |= request_bits(leave_type, half_day, start, end).get(year, 0)
+    return bits
+
+
+def rebuild(employee_id, year: int) -> int:
+    bits = compute(employee_id, year)
+    LeaveOccupancy.objects.update_or_create(
+        employee_id=employee_id, year=year, defaults={"bits": _encode(bits)}
+    )
+    return bits
+
+
+def rebuild_many(employee_ids, years) -> None:
+    """직원들 x 년도들 비트맵을 한 번에 다시 계산 (bulk 저장 후). 원본 1쿼리 + 저장"""
+    employee_ids, years = set(employee_ids), sorted(set(years))
+    if not employee_ids or not years:
+        return
+    bits = {(eid, y): 0 for eid in employee_ids for y in years}
+    rows = LeaveRequest.objects.filter(
+        employee_id__in=employee_ids,
+        start_date__lte=date(years[-1], 12, 31),
+        end_date__gte=date(years[0], 1, 1),
+    ).values_list("employee_id", "leave_type", "half_day", "start_date", "end_date")
+    for eid, leave_type, half_day, start, end in rows.iterator():
+        for y, b in request_bits(leave_type, half_day, start, end).items():
+            if (eid, y) in bits:
+                bits[(eid, y)] |= b
+
+    LeaveOccupancy.objects.filter(employee_id__in=employee_ids, year__in=years).delete()
+    LeaveOccupancy.objects.bulk_create(
+        [LeaveOccupancy(employee_id=eid, year=y, bits=_encode(b)) for (eid, y), b in bits.items()],
+        batch_size=500,
+    )
+
+
+def load(employee_id, years) -> dict:
+    """{year: 비트} (1쿼리). 행이 없는 년도는 원본에서 계산만 (저장 X)"""
+    return {y: b for (_, y), b in load_many([employee_id], years).items()}
+
+
+def load_many(employee_ids, years) -> dict:
+    """{(employee_id, year): 비트} 여러 직원 한 번에 (저장된 행 1쿼리 + 없는 행 원본 1쿼리)"""
+    employee_ids, years = set(employee_ids), sorted(set(years))
+    result = {
+        (eid, y): _decode(raw)
+        for eid, y, raw in LeaveOccupancy.objects.filter(
+            employee_id__in=employee_ids, year__in=years
+        ).values_list("employee_id", "year", "bits")
+    }
+    missing = {(eid, y) for eid in employee_ids for y in years} - set(result)
+    if missing:
+        for key in missing:
+            result[key] = 0
+        rows = LeaveRequest.objects.filter(
+            employee_id__in={eid for eid, _ in missing},
+            start_date__lte=date(max(y for _, y in missing), 12, 31),
+            end_date__gte=date(min(y for _, y in missing), 1, 1),
+        ).values_list("employee_id", "leave_type", "half_day", "start_date", "end_date")
+        for eid, leave_type, half_day, start, end in rows:
+            for y, b in request_bits(leave_type, half_day, start, end).items():
+                if (eid, y) in missing:
+                    result[(eid, y)] |= b
+    return result
+
+
+def conflicts(employee_id, leave_type, half_day, start: date, end: date) -> bool:
+    """그 기간에 이미 신청이 있는 날이 있는지 (중복 신청 확인, 반차도 하루 전체로 봄)"""
+    wanted = span_bits(start, end or start, FULL)
+    current = load(employee_id, wanted)
+    return any(current[y] & bits for y, bits in wanted.items())
+
+
+def is_off(employee_id, d: date, mask: int = FULL) -> bool:
+    """그날(기본: 오전/오후 중 하나라도) 휴무인지"""
+    bits = load(employee_id, [d.year])[d.year]
+    return bool((bits >> (2 * (d - date(d.year, 1, 1)).days)) & mask)
+
+
+def mark(instance) -> None:
+    """새 신청 -> 점유 칸 OR"""
+    for year, bits in request_bits(instance.leave_type, instance.half_day, instance.start_date, instance.end_date).items():
+        row = LeaveOccupancy.objects.select_for_update().filter(employee_id=instance.employee_id, year=year).first()
+        if row is None:
+            rebuild(instance.employee_id, year)   # 이미 저장된 이 신청 포함
+            continue
+        row.bits = _encode(_decode(row.bits) | bits)
+        row.save(update_fields=["bits", "updated_at"])
+
+
+def refresh(employee_id, *ranges) -> None:
+    """수정/삭제 -> 관련 년도를 원본에서 다시 계산"""
+    years = set()
+    for start, end in ranges:
+        if start:
+            years.update(range(start.year, (end or start).year + 1))
+    for year in sorted(years):
+        rebuild(employee_id, year)
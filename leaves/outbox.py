@@ -0,0 +1,262 @@
+# leaves/outbox.py
+"""
+텔레그램 알림 보낼 함 (Notification)
+- enqueue(): 호출한 쪽 트랜잭션 안에서 한 줄 기록 -> 신청이 롤백되면 알림도 없음
+- 전달은 워커가: manage.py send_notifications (별도 프로세스)
+  또는 OUTBOX_THREAD=True 면 웹 프로세스 안의 백그라운드 스레드
+  (서버 시작 때 start() -> 재시작 전에 밀린 알림도 바로 보냄, 이후 커밋 직후 깨움)
+- 실패하면 2^n 초 간격으로 재시도 (최대 OUTBOX_MAX_ATTEMPTS 번, 429 면 텔레그램이 알려준 시간 뒤)
+- 여러 워커가 같이 돌아도 조건부 UPDATE 로 가져가므로 한 건은 한 워커만 보냄
+- 묶어 보내기: 새 알림은 OUTBOX_COALESCE_SECONDS 뒤에 보낼 차례 -> 그 사이 쌓인 같은 채팅방 알림은 한 메시지로
+- 채팅방별 토큰 버킷(분당 TELEGRAM_RATE_PER_MINUTE)으로 전송 속도 제한 -> 토큰이 없으면 다음 토큰 때로 미룸
+  (버킷은 DB 의 ChatRateLimit 행 -> 워커/프로세스가 여러 개여도 합쳐서 제한)
+"""
+import logging
+import random
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ChatRateLimit, Notification
+from .utils.telegram import TelegramError, deliver, resolve_chat_id
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8)
+OUTBOX_BACKOFF_MAX_SECONDS = getattr(settings, "OUTBOX_BACKOFF_MAX_SECONDS", 60 * 30)
+OUTBOX_POLL_SECONDS = getattr(settings, "OUTBOX_POLL_SECONDS", 10)
+# 보내는 중 표시 시간 (워커가 죽으면 이 시간 뒤 다른 워커가 다시 가져감)
+OUTBOX_LEASE_SECONDS = getattr(settings, "OUTBOX_LEASE_SECONDS", 60)
+OUTBOX_THREAD = getattr(settings, "OUTBOX_THREAD", True)
+# 이 시간(초) 안에 생긴 알림은 한 메시지로 묶음 (0 이면 바로 보냄)
+OUTBOX_COALESCE_SECONDS = getattr(settings, "OUTBOX_COALESCE_SECONDS", 5)
+# 채팅방별 전송 속도 (텔레그램 그룹 채팅 제한: 분당 20개)
+TELEGRAM_RATE_PER_MINUTE = getattr(settings, "TELEGRAM_RATE_PER_MINUTE", 20)
+TELEGRAM_BURST = getattr(settings, "TELEGRAM_BURST", 3)
+TELEGRAM_MAX_CHARS = 4096
+DIGEST_SEPARATOR = "\n\n"
+
+
+def enqueue(text: str, chat_id: str = "") -> Notification:
+    """알림 1건 기록 (커밋되면 워커가 전달)"""
+    notification = Notification.objects.create(
+        text=text,
+        chat_id=chat_id or "",
+        next_attempt_at=timezone.now() + timedelta(seconds=OUTBOX_COALESCE_SECONDS),
+    )
+    if OUTBOX_THREAD:
+        transaction.on_commit(_wake)
+    return notification
+
+
+def backoff(attempts: int) -> timedelta:
+    """n번째 실패 뒤 대기 시간 (2^n 초 + 약간의 흔들림, 상한 있음)"""
+    seconds = min(2 ** attempts, OUTBOX_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=seconds * random.uniform(1.0, 1.25))
+
+
+def take_token(chat_id) -> float:
+    """
+    채팅방 토큰 1개 사용 -> 0, 없으면 다음 토큰까지 남은 초 (기다리지 않음)
+    읽은 값 그대로일 때만 차감 (다른 워커가 먼저 썼으면 다시 읽음)
+    """
+    rate = TELEGRAM_RATE_PER_MINUTE / 60
+    for _ in range(5):
+        now = timezone.now()
+        row = ChatRateLimit.objects.filter(chat_id=chat_id).values("tokens", "refilled_at").first()
+        if row is None:
+            try:
+                with transaction.atomic():
+                    ChatRateLimit.objects.create(chat_id=chat_id, tokens=TELEGRAM_BURST - 1, refilled_at=now)
+                return 0.0
+            except IntegrityError:
+                continue   # 다른 워커가 먼저 만듦
+
+        elapsed = (now - row["refilled_at"]).total_seconds()   # 쉬는 중이면 음수
+        tokens = min(TELEGRAM_BURST, row["tokens"] + max(elapsed, 0) * rate)
+        if tokens < 1:
+            return max(-elapsed, 0) + (1 - tokens) / rate
+        updated = ChatRateLimit.objects.filter(chat_id=chat_id, **row).update(
+            tokens=tokens - 1, refilled_at=max(now, row["refilled_at"]),
+        )
+        if updated:
+            return 0.0
+    return 1.0 / rate   # 계속 겹침 -> 토큰 하나 만큼 뒤에
+
+
+def pause_chat(chat_id, seconds: float) -> None:
+    """텔레그램이 기다리라고 함 (429 retry_after) -> 그 시간 동안 토큰 비움"""
+    until = timezone.now() + timedelta(seconds=seconds)
+    updated = ChatRateLimit.objects.filter(chat_id=chat_id, refilled_at__lt=until).update(tokens=0, refilled_at=until)
+    if not updated and not ChatRateLimit.objects.filter(chat_id=chat_id).exists():
+        try:
+            with transaction.atomic():
+                ChatRateLimit.objects.create(chat_id=chat_id, tokens=0, refilled_at=until)
+        except IntegrityError:
+            pass
+
+
+def _claim(limit):
+    """
+    보낼 차례인 알림을 가져감 (다른 워커가 먼저 가져간 건 건너뜀)
+    차례가 된 게 있으면 묶음 시간 안에 차례가 될 것도 같이 (한 메시지로 묶기)
+    """
+    now = timezone.now()
+    pending = Notification.objects.filter(status=Notification.Status.PENDING)
+    if not pending.filter(next_attempt_at__lte=now).exists():
+        return []
+    due = list(
+        pending.filter(next_attempt_at__lte=now + timedelta(seconds=OUTBOX_COALESCE_SECONDS))
+        .order_by("next_attempt_at", "id")
+        .values_list("id", "next_attempt_at")[:limit]
+    )
+    lease = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    claimed = [
+        pk for pk, at in due
+        if Notification.objects.filter(pk=pk, status=Notification.Status.PENDING, next_attempt_at=at)
+        .update(next_attempt_at=lease)
+    ]
+    return list(Notification.objects.filter(pk__in=claimed).order_by("id"))
+
+
+def digests(rows):
+    """알림 목록 -> 메시지 길이 제한 안에서 묶음 목록 [[Notification, ...], ...]"""
+    groups, current, size = [], [], 0
+    for n in rows:
+        extra = len(n.text) + (len(DIGEST_SEPARATOR) if current else 0)
+        if current and size + extra > TELEGRAM_MAX_CHARS:
+            groups.append(current)
+            current, size = [], 0
+            extra = len(n.text)
+        current.append(n)
+        size += extra
+    if current:
+        groups.append(current)
+    return groups
+
+
+def digest_text(group) -> str:
+    return DIGEST_SEPARATOR.join(n.text for n in group)
+
+
+def _failed(group, error: TelegramError) -> int:
+    """전송 실패 -> 재시도 예약 (포기한 건수 반환)"""
+    now = timezone.now()
+    gave_up = 0
+    for n in group:
+        n.attempts += 1
+        n.last_error = str(error)[:300]
+        if error.permanent or n.attempts >= OUTBOX_MAX_ATTEMPTS:
+            n.status = Notification.Status.FAILED
+            gave_up += 1
+            logger.error("알림 #%s 전달 포기: %s", n.pk, error)
+        else:
+            wait = timedelta(seconds=error.retry_after) if error.retry_after else backoff(n.attempts)
+            n.next_attempt_at = now + wait
+    Notification.objects.bulk_update(group, ["attempts", "last_error", "status", "next_attempt_at"])
+    return gave_up
+
+
+def deliver_due(limit: int = 50):
+    """
+    보낼 차례인 알림 전달 -> (전송 수, 재시도/미룸 수, 포기 수)  (알림 건수 기준)
+    채팅방별로 묶어서 1메시지, 토큰이 없으면 남은 묶음은 다음 토큰 때로
+    """
+    sent = retried = failed = 0
+    by_chat = defaultdict(list)
+    for n in _claim(limit):
+        by_chat[resolve_chat_id(n.chat_id)].append(n)
+
+    for chat_id, rows in by_chat.items():
+        groups = digests(rows)
+        for i, group in enumerate(groups):
+            wait = take_token(chat_id)
+            if wait:
+                # 속도 제한 -> 시도 횟수는 그대로 두고 미룸
+                later = [n.pk for g in groups[i:] for n in g]
+                Notification.objects.filter(pk__in=later).update(
+                    next_attempt_at=timezone.now() + timedelta(seconds=wait)
+                )
+                retried += len(later)
+                break
+            try:
+                deliver(digest_text(group), chat_id or None)
+            except TelegramError as e:
+                if e.retry_after:
+                    pause_chat(chat_id, e.retry_after)
+                gave_up = _failed(group, e)
+                failed += gave_up
+                retried += len(group) - gave_up
+                continue
+            now = timezone.now()
+            Notification.objects.filter(pk__in=[n.pk for n in group]).update(
+                status=Notification.Status.SENT, sent_at=now, attempts=F("attempts") + 1,
+            )
+            sent += len(group)
+    return sent, retried, failed
+
+
+def _next_due_in(poll_seconds) -> float:
+    """다음 알림 차례까지 남은 초 (최대 poll_seconds)"""
+    next_at = (
+        Notification.objects.filter(status=Notification.Status.PENDING)
+        .order_by("next_attempt_at").values_list("next_attempt_at", flat=True).first()
+    )
+    if next_at is None:
+        return poll_seconds
+    return min(max((next_at - timezone.now()).total_seconds(), 0.1), poll_seconds)
+
+
+def run_worker(stop_event=None, poll_seconds=None, wake_event=None):
+    """stop_event 가 set 될 때까지 주기적으로 전달"""
+    stop_event = stop_event or threading.Event()
+    poll_seconds = OUTBOX_POLL_SECONDS if poll_seconds is None else poll_seconds
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            sent, retried, failed = deliver_due()
+        except Exception:
+            logger.exception("알림 전달 워커 오류")
+            sent = 0
+        if sent:
+            continue   # 더 있을 수 있음
+        try:
+            wait = _next_due_in(poll_seconds)
+        except Exception:
+            wait = poll_seconds
+        if wake_event is not None:
+            wake_event.wait(wait)
+            wake_event.clear()
+        else:
+            stop_event.wait(wait)
+
+
+## ===== 웹 프로세스 안 백그라운드 스레드 (OUTBOX_THREAD) =====
+_thread = None
+_thread_lock = threading.Lock()
+_wake_event = threading.Event()
+_stop_event = threading.Event()
+
+
+def start():
+    """백그라운드 스레드 시작 (이미 돌고 있으면 깨우기만). apps.ready() 에서 서버 프로세스일 때 호출"""
+    _wake()
+
+
+def _wake():
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(
+                target=run_worker,
+                kwargs={"stop_event": _stop_event, "wake_event": _wake_event},
+                name="leaves-outbox",
+                daemon=True,
+            )
+            _thread.start()
+    _wake_event.set()
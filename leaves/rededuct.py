@@ -0,0 +1,75 @@
+# leaves/rededuct.py
+"""
+차감 다시 계산 (대체휴무 우선 규칙 재적용)
+- used_comp / used_annual 은 신청 당시 스냅샷 -> 나중에 더 이른 근무일의 발생이 추가되거나
+  신청이 삭제되면 그 이후 신청들의 대체/연차 나눔이 달라짐
+- 바뀐 날짜(기준일) 이후 신청만 시작일 순으로 다시 나누고 bulk_update
+  (기준일 이전 신청은 그대로, 그 사용량만큼 빼고 시작)
+- 신청별 총 차감(used_comp + used_annual)은 유지, 나눔만 바뀜 / 반차는 항상 연차
+- signals.py (발생 저장·삭제, 신청 삭제·날짜 변경), 관리자 액션, 일괄 발생 등록에서 호출
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from . import comp_alloc, ledger
+from .models import CompDayGrant, LeaveRequest
+
+ZERO = Decimal("0")
+
+
+def rededuct(since_by_year: dict, grants_changed=False) -> int:
+    """
+    since_by_year: {leave_year_id: 기준일} (기준일 없으면 년도 전체)
+    grants_changed: 발생이 바뀐 경우 -> 나눔이 그대로여도 FIFO 배분은 다시
+    return: 나눔이 바뀐 신청 수
+    쿼리: 신청 1 + 발생 합계 1 (+ 바뀐 게 있으면 저장/집계/배분)
+    """
+    since_by_year = {ly_id: since or date.min for ly_id, since in since_by_year.items() if ly_id}
+    if not since_by_year:
+        return 0
+    ids = list(since_by_year)
+
+    granted = dict(
+        CompDayGrant.objects.filter(leave_year_id__in=ids)
+        .values("leave_year_id").annotate(s=Sum("amount")).values_list("leave_year_id", "s")
+    )
+    pool = {ly_id: Decimal(granted.get(ly_id) or 0) for ly_id in ids}
+
+    requests = (
+        LeaveRequest.objects.filter(leave_year_id__in=ids)
+        .order_by("start_date", "id")
+        .only("id", "leave_year_id", "leave_type", "start_date", "used_comp", "used_annual")
+    )
+    after = defaultdict(list)
+    for r in requests:
+        if r.start_date < since_by_year[r.leave_year_id]:
+            pool[r.leave_year_id] -= r.used_comp   # 기준일 이전은 그대로
+        else:
+            after[r.leave_year_id].append(r)
+
+    changed = []
+    for ly_id, rows in after.items():
+        for r in rows:
+            units = r.used_comp + r.used_annual
+            used_comp = ZERO
+            if r.leave_type == LeaveRequest.LeaveType.ANNUAL and units >= 1:
+                used_comp = max(ZERO, min(pool[ly_id], units))
+            pool[ly_id] -= used_comp
+            if used_comp != r.used_comp:
+                r.used_comp = used_comp
+                r.used_annual = units - used_comp
+                changed.append(r)
+
+    touched = {r.leave_year_id for r in changed}
+    if changed:
+        # bulk_update 는 시그널이 없으므로 집계/배분은 여기서
+        LeaveRequest.objects.bulk_update(changed, ["used_comp", "used_annual"], batch_size=500)
+        ledger.rebuild_many(touched)
+    if grants_changed:
+        touched = ids
+    if touched:
+        comp_alloc.reallocate(touched)
+    return len(changed)
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from datetime import date, timedelta
 from decimal import Decimal
 from decimal import ROUND_FLOOR
-from django.db import models
+from django.db import OperationalError, connection, models, transaction
 from decimal import Decimal
 
 @dataclass
@@ -14,14 +14,11 @@ class LeaveDemand:
 
 def calc_requested_amount(leave_type: str, start: date, end: date, half_day: str | None) -> Decimal:
     """
-    - 연차: start~end inclusive 일수(토/일은 아직 규칙 반영 X, 추후 가능)
+    - 연차: start~end 영업일 수 (주말/공휴일 제외, business_days.py)
     - 반차: 0.5
     """
-    if leave_type == "HALF":
-        return Decimal("0.5")
-    # ANNUAL
-    days = (end - start).days + 1
-    return Decimal(days)
+    from .business_days import leave_units  # 지연 import
+    return leave_units(leave_type, start, end)
 
 def split_demand_by_rule(total: Decimal, leave_type: str) -> LeaveDemand:
     """
@@ -45,15 +42,11 @@ def calc_comp_balance(leave_year) -> Decimal:
     leave_year 기준:
     - 발생: CompDayGrant.amount 합
     - 사용: LeaveRequest.used_comp 합
+    (LeaveBalance 집계 행에서 읽음)
     """
-    from .models import CompDayGrant, LeaveRequest  # 지연 import
-    granted = CompDayGrant.objects.filter(leave_year=leave_year).aggregate(
-        s=models.Sum("amount")
-    )["s"] or Decimal("0")
-    used = LeaveRequest.objects.filter(leave_year=leave_year).aggregate(
-        s=models.Sum("used_comp")
-    )["s"] or Decimal("0")
-    return Decimal(granted) - Decimal(used)
+    from .ledger import get_balance  # 지연 import
+    balance = get_balance(leave_year)
+    return Decimal(balance.comp_granted) - Decimal(balance.used_comp)
 
 def auto_deduct(leave_year, leave_type: str, requested_amount: Decimal) -> tuple[Decimal, Decimal]:
     """
@@ -80,3 +73,385 @@ def auto_deduct(leave_year, leave_type: str, requested_amount: Decimal) -> tuple
     # used_annual은 부족해도 그대로 (음수 잔여 허용은 잔여 계산에서 처리)
     return used_comp, used_annual
 
+
+
+class DuplicateLeave(Exception):
+    """같은 직원이 겹치는 기간에 이미 신청함"""
+
+
+class SubmissionConflict(Exception):
+    """동시 신청이 계속 겹쳐서 저장하지 못함 (잠시 후 다시 시도)"""
+
+
+class _Retry(Exception):
+    pass
+
+
+# 동시 신청이 겹칠 때 다시 시도하는 횟수
+SUBMIT_ATTEMPTS = 3
+
+
+def submit_leave(employee, leave_type: str, half_day, start: date, end: date, reason: str, units, notice: str = ""):
+    """
+    휴무 신청 저장 (request_new)
+    - 한 트랜잭션: LeaveYear+잔여 읽기 -> 중복 확인(점유 비트맵) -> 잔여 조건부 증감 -> 신청 저장
+    - 잔여 행을 읽은 값 그대로일 때만 증감 (ledger.compare_and_apply)
+      -> 같은 직원 동시 신청은 하나만 통과, 나머지는 다시 읽고 재시도 (사이트 전체 잠금 X)
+    - 쿼리: 보통 12개 = BEGIN + 쓰기 잠금(SQLite) + LeaveYear/잔여 읽기 + 점유 비트맵 읽기 + 잔여 증감 + 신청 저장
+      + 신청 시그널(달력 stamp, 점유 비트맵 읽기/저장) + 알림 기록 + COMMIT + 커밋 뒤 달력 변경 기록
+      (그 해 첫 신청은 LeaveYear / 집계 / 점유 비트맵 행 생성이 더해짐)
+    - notice: 텔레그램 알림 문구 -> 같은 트랜잭션에서 보낼 함에 기록 (leaves/outbox.py)
+    return: 저장된 LeaveRequest / DuplicateLeave / SubmissionConflict
+    """
+    for _ in range(SUBMIT_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                _lock_for_write()
+                leave_request = _submit_once(employee, leave_type, half_day, start, end, reason, units)
+                if notice:
+                    from . import outbox  # 지연 import
+                    outbox.enqueue(notice)
+                return leave_request
+        except _Retry:
+            continue
+        except OperationalError as e:
+            # SQLite: 쓰기 잠금 대기(timeout)도 넘김 -> 500 대신 다시 시도
+            if "locked" not in str(e):
+                raise
+    raise SubmissionConflict()
+
+
+def _lock_for_write() -> None:
+    """
+    SQLite: 트랜잭션 첫 문장으로 쓰기 잠금을 잡음 (BEGIN IMMEDIATE 와 같은 효과)
+    - BEGIN 뒤 읽기부터 하면 동시 신청끼리 읽기 -> 쓰기 잠금 올리기에서 서로 기다리게 되고,
+      SQLite 는 기다리지 않고 바로 "database is locked"
+    - 먼저 잡으면 나머지는 busy timeout 동안 차례를 기다림 (다른 직원 신청도 한 번에 하나씩 쓰기)
+    다른 DB 는 행 단위 잠금이라 필요 없음 (겹침은 compare_and_apply 가 거름)
+    """
+    if connection.vendor != "sqlite":
+        return
+    from .models import LeaveBalance  # 지연 import
+    with connection.cursor() as cursor:
+        cursor.execute(f"UPDATE {LeaveBalance._meta.db_table} SET version = version WHERE 0")
+
+
+def _submit_once(employee, leave_type, half_day, start, end, reason, units):
+    from .models import LeaveBalance, LeaveYear, LeaveRequest  # 지연 import
+    from . import ledger, occupancy  # 지연 import
+
+    # 1) LeaveYear + 잔여 집계 (1쿼리)
+    names = (*ledger.BALANCE_FIELDS, "version")
+    fields = ["balance__" + f for f in names]
+    row = LeaveYear.objects.filter(employee=employee, year=start.year).values("id", *fields).first()
+    if row is None or row["balance__comp_granted"] is None:
+        # 처음 신청하는 년도 (또는 집계 행 없음) -> 여기서만 생성
+        ly, created = LeaveYear.objects.get_or_create(
+            employee=employee, year=start.year, defaults={"base_days": 0, "carry_over": 0}
+        )
+        # 새 년도: 집계 행은 LeaveYear 시그널이 0으로 만들어 둠 -> 원본 합계를 다시 셀 필요 없음
+        balance = LeaveBalance(leave_year=ly) if created else ledger.rebuild(ly.id)
+        row = {"id": ly.id, **{"balance__" + f: getattr(balance, f) for f in names}}
+    expected = {f: row["balance__" + f] for f in names}
+
+    # 2) 같은 직원 + 같은 날짜(기간 겹침 포함, 반차도 날짜 단위) 중복 신청 방지
+    if occupancy.conflicts(employee.id, leave_type, half_day, start, end):
+        raise DuplicateLeave()
+
+    # 3) 대체휴무 우선 소진 (반차(0.5)는 대체휴무 사용하지 않고 연차에서 차감)
+    units = Decimal(str(units))
+    used_comp = Decimal("0")
+    if leave_type == LeaveRequest.LeaveType.ANNUAL and units >= 1:
+        comp_avail = Decimal(expected["comp_granted"]) - Decimal(expected["used_comp"])
+        used_comp = max(Decimal("0"), min(comp_avail, units))
+    used_annual = max(Decimal("0"), units - used_comp)
+
+    if not ledger.compare_and_apply(row["id"], expected, used_comp=used_comp, used_annual=used_annual):
+        raise _Retry()
+
+    # 4) 저장 (잔여 증감은 위에서 했으므로 시그널은 건너뜀)
+    leave = LeaveRequest(
+        leave_year_id=row["id"],
+        employee=employee,
+        leave_type=leave_type,
+        half_day=half_day if leave_type == LeaveRequest.LeaveType.HALF else None,
+        start_date=start,
+        end_date=end,
+        reason=reason,
+        used_comp=used_comp,
+        used_annual=used_annual,
+    )
+    leave._balance_applied = True
+    leave.save()
+    return leave
+
+
+@dataclass
+class YearBalance:
+    """직원 1명의 특정년도 잔여 계산 결과 (year_balances 에서 생성)"""
+    employee: object
+    year: int
+    leave_year_id: int | None
+    base_days: Decimal
+    carry_over: Decimal
+    comp_granted: Decimal
+    used_comp: Decimal
+    used_annual: Decimal
+    comp_grants: list    # [{"worked_date", "holiday_name", "amount", "memo"}, ...] 근무일순
+
+    @property
+    def total_annual(self) -> Decimal:
+        return self.base_days + self.carry_over
+
+    @property
+    def total_grant(self) -> Decimal:
+        return self.total_annual + self.comp_granted
+
+    @property
+    def total_used(self) -> Decimal:
+        return self.used_comp + self.used_annual
+
+    @property
+    def remain_comp(self) -> Decimal:
+        return self.comp_granted - self.used_comp
+
+    @property
+    def remain_annual(self) -> Decimal:
+        return self.total_annual - self.used_annual
+
+    @property
+    def remain(self) -> Decimal:
+        # 마이너스 허용
+        return self.total_grant - self.total_used
+
+
+def empty_leave_year(employee, year: int):
+    """아직 없는 년도 -> 저장하지 않은 0 잔여 LeaveYear (pk=None, 조회 화면용)"""
+    from .models import LeaveYear  # 지연 import
+    return LeaveYear(employee=employee, year=year, base_days=Decimal("0.0"), carry_over=Decimal("0.0"))
+
+
+def find_leave_year(employee, year: int):
+    """
+    조회 전용: 있으면 LeaveYear, 없으면 empty_leave_year (DB 에 쓰지 않음)
+    -> GET 화면은 읽기 트랜잭션만 사용. 실제 생성은 신청/발생 저장 때(get_or_create) 또는 provision_years
+    """
+    from .models import LeaveYear  # 지연 import
+    return LeaveYear.objects.filter(employee=employee, year=year).first() or empty_leave_year(employee, year)
+
+
+def ensure_leave_years(year: int, employee_ids) -> int:
+    """없는 LeaveYear(year)만 한 번에 생성 (잔여 집계 행 포함) -> 생성 개수"""
+    from .models import LeaveYear, LeaveBalance  # 지연 import
+    existing = set(
+        LeaveYear.objects.filter(year=year, employee_id__in=employee_ids).values_list("employee_id", flat=True)
+    )
+    missing = [
+        LeaveYear(employee_id=eid, year=year, base_days=0, carry_over=0)
+        for eid in employee_ids if eid not in existing
+    ]
+    LeaveYear.objects.bulk_create(missing, ignore_conflicts=True)
+
+    # bulk_create 는 시그널이 없으므로 집계 행도 여기서 (새 년도라 전부 0)
+    created_ids = LeaveYear.objects.filter(
+        year=year, employee_id__in=[m.employee_id for m in missing]
+    ).values_list("id", flat=True)
+    LeaveBalance.objects.bulk_create(
+        [LeaveBalance(leave_year_id=ly_id) for ly_id in created_ids], ignore_conflicts=True
+    )
+    return len(missing)
+
+
+def grant_comp_days(employee_ids, year: int, worked_date: date, holiday_name: str, amount, memo: str = "") -> int:
+    """
+    대체휴무 발생 일괄 등록 (직원 수와 무관하게 몇 개 쿼리)
+    - 없는 LeaveYear 생성 + 발생 upsert 를 한 트랜잭션에서 bulk 로
+    - (LeaveYear, 근무일, 공휴일명) 이 이미 있으면 수량/메모만 갱신 (중복 제출해도 한 번)
+      -> 이미 쓴 양은 유지 (remaining 을 수량 차이만큼 조정)
+    - bulk 라 시그널이 없으므로 잔여 집계는 ledger.rebuild_many
+    - 근무일 이후 신청은 대체휴무 우선 규칙 다시 적용 (rededuct)
+    return: 처리한 직원 수
+    """
+    from .models import CompDayGrant, LeaveYear  # 지연 import
+    from . import ledger, rededuct  # 지연 import
+
+    employee_ids = list(employee_ids)
+    holiday_name = holiday_name or ""
+    amount = Decimal(str(amount))
+    with transaction.atomic():
+        ensure_leave_years(year, employee_ids)
+        ly_ids = list(
+            LeaveYear.objects.filter(year=year, employee_id__in=employee_ids).values_list("id", flat=True)
+        )
+        existing = {
+            ly_id: (old_amount, remaining)
+            for ly_id, old_amount, remaining in CompDayGrant.objects.filter(
+                leave_year_id__in=ly_ids, worked_date=worked_date, holiday_name=holiday_name
+            ).values_list("leave_year_id", "amount", "remaining")
+        }
+        grants = []
+        for ly_id in ly_ids:
+            old_amount, remaining = existing.get(ly_id, (Decimal("0"), Decimal("0")))
+            grants.append(CompDayGrant(
+                leave_year_id=ly_id,
+                worked_date=worked_date,
+                holiday_name=holiday_name,
+                amount=amount,
+                memo=memo or "",
+                remaining=Decimal(remaining) + amount - Decimal(old_amount),
+            ))
+        CompDayGrant.objects.bulk_create(
+            grants,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["leave_year", "worked_date", "holiday_name"],
+            update_fields=["amount", "memo", "remaining"],
+        )
+        ledger.rebuild_many(ly_ids)
+        rededuct.rededuct(dict.fromkeys(ly_ids, worked_date), grants_changed=True)
+    return len(ly_ids)
+
+
+def year_balances(year: int, employees=None) -> list[YearBalance]:
+    """
+    직원 전체(또는 employees queryset)의 year 잔여를 고정된 쿼리 수로 계산
+    - 직원 + LeaveYear 값 + 발생/사용 합계(LeaveBalance): 서브쿼리로 1쿼리
+    - 대체휴무 발생 내역: 1쿼리
+    - LeaveYear 가 없는 직원은 0 잔여로 표시 (DB 에 쓰지 않음)
+    """
+    from .models import Employee, LeaveYear, CompDayGrant  # 지연 import
+    from . import ledger  # 지연 import
+
+    if employees is None:
+        employees = Employee.objects.filter(is_active=True).order_by("name")
+
+    ly_qs = LeaveYear.objects.filter(employee=models.OuterRef("pk"), year=year)
+    employees = list(
+        employees.annotate(
+            ly_id=models.Subquery(ly_qs.values("id")[:1]),
+            ly_base_days=models.Subquery(ly_qs.values("base_days")[:1]),
+            ly_carry_over=models.Subquery(ly_qs.values("carry_over")[:1]),
+            comp_granted_sum=models.Subquery(ly_qs.values("balance__comp_granted")[:1]),
+            used_comp_sum=models.Subquery(ly_qs.values("balance__used_comp")[:1]),
+            used_annual_sum=models.Subquery(ly_qs.values("balance__used_annual")[:1]),
+        )
+    )
+
+    # 집계 행이 없는 LeaveYear (bulk 작업 등) -> 원본에서 계산만 (저장은 rebuild_balances)
+    for e in employees:
+        if e.ly_id is not None and e.comp_granted_sum is None:
+            v = ledger.compute(e.ly_id)
+            e.comp_granted_sum, e.used_comp_sum, e.used_annual_sum = v["comp_granted"], v["used_comp"], v["used_annual"]
+
+    grants_by_emp = {}
+    if employees:
+        grants = (
+            CompDayGrant.objects
+            .filter(leave_year__year=year, leave_year__employee_id__in=[e.id for e in employees])
+            .order_by("worked_date", "id")
+            .values("leave_year__employee_id", "worked_date", "holiday_name", "amount", "memo")
+        )
+        for g in grants:
+            eid = g.pop("leave_year__employee_id")
+            grants_by_emp.setdefault(eid, []).append(g)
+
+    return [
+        YearBalance(
+            employee=e,
+            year=year,
+            leave_year_id=e.ly_id,
+            # 서브쿼리 값은 SQLite 에서 소수 자릿수가 빠지므로 모델 필드처럼 맞춤
+            base_days=Decimal(e.ly_base_days or 0).quantize(Decimal("0.1")),
+            carry_over=Decimal(e.ly_carry_over or 0).quantize(Decimal("0.1")),
+            comp_granted=Decimal(e.comp_granted_sum or 0).quantize(Decimal("0.1")),
+            used_comp=Decimal(e.used_comp_sum or 0).quantize(Decimal("0.1")),
+            used_annual=Decimal(e.used_annual_sum or 0).quantize(Decimal("0.1")),
+            comp_grants=grants_by_emp.get(e.id, []),
+        )
+        for e in employees
+    ]
+
+
+def _month_key(d: date) -> str:
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+def split_by_month(start: date, end: date, amount) -> list[tuple[str, Decimal]]:
+    """
+    여러 달에 걸친 신청의 사용량을 월별로 배분 -> [("YYYY-MM", 사용량)]
+    - 각 달의 영업일(주말/공휴일 제외) 수만큼 앞 달부터 채움
+    - 남는 양(주말 포함 신청 등)은 마지막 달에
+    """
+    from .business_days import business_days  # 지연 import
+
+    amount = Decimal(amount or 0)
+    if (start.year, start.month) == (end.year, end.month):
+        return [(_month_key(start), amount)]
+
+    result = []
+    left = amount
+    cur = start
+    while cur <= end:
+        next_month = date(cur.year + cur.month // 12, cur.month % 12 + 1, 1)
+        seg_end = min(end, next_month - timedelta(days=1))
+        take = min(left, Decimal(business_days(cur, seg_end)))
+        result.append((_month_key(cur), take))
+        left -= take
+        cur = next_month
+    if left:
+        key, last = result[-1]
+        result[-1] = (key, last + left)
+    return result
+
+
+def monthly_used_by_employee(year: int, employee_ids) -> dict:
+    """
+    {employee_id: {"YYYY-MM": 사용합(used_comp + used_annual)}} 직원 x 월 전체 표 (사용 없는 달은 0)
+    - 한 달 안에 끝나는 신청: DB 에서 직원/월별 GROUP BY (1쿼리)
+    - 여러 달에 걸친 신청만 따로 읽어서 영업일 기준으로 나눔 (1쿼리, 보통 몇 건)
+    - 다음 해로 넘어가는 신청은 그 달 키가 추가됨
+    """
+    from django.db.models.functions import TruncMonth
+    from .models import LeaveRequest  # 지연 import
+
+    employee_ids = list(employee_ids)
+    zero = Decimal("0.0")
+    months = [f"{year:04d}-{m:02d}" for m in range(1, 13)]
+    result = {eid: dict.fromkeys(months, zero) for eid in employee_ids}
+    if not employee_ids:
+        return result
+
+    qs = (
+        LeaveRequest.objects
+        .filter(leave_year__year=year, leave_year__employee_id__in=employee_ids)
+        .annotate(start_month=TruncMonth("start_date"), end_month=TruncMonth("end_date"))
+    )
+    used = models.ExpressionWrapper(
+        models.F("used_comp") + models.F("used_annual"),
+        output_field=models.DecimalField(max_digits=6, decimal_places=1),
+    )
+    grouped = (
+        qs.filter(start_month=models.F("end_month"))
+        .order_by()
+        .values("leave_year__employee_id", "start_month")
+        .annotate(s=models.Sum(used))
+        .values_list("leave_year__employee_id", "start_month", "s")
+    )
+    for eid, month, total in grouped:
+        key = _month_key(month)
+        row = result[eid]
+        row[key] = row.get(key, zero) + Decimal(total or 0)
+
+    spanning = (
+        qs.exclude(start_month=models.F("end_month"))
+        .values_list("leave_year__employee_id", "start_date", "end_date", "used_comp", "used_annual")
+    )
+    for eid, start, end, used_comp, used_annual in spanning:
+        row = result[eid]
+        for key, amount in split_by_month(start, end, Decimal(used_comp or 0) + Decimal(used_annual or 0)):
+            row[key] = row.get(key, zero) + amount
+
+    for row in result.values():
+        for key, v in row.items():
+            row[key] = Decimal(v).quantize(Decimal("0.1"))
+    return result
@@ -0,0 +1,255 @@
+# leaves/signals.py
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import holiday_table
+from .calendar_events import bump_calendar_stamp, invalidate_months, invalidate_all
+from .calendar_push import describe_change, record_change
+from . import ledger
+from . import comp_alloc
+from . import occupancy
+from . import rededuct
+from .models import (
+    CompanyHoliday, LeaveRequest, CalendarMemo, Employee, CalendarChange,
+    CompDayGrant, LeaveYear, LeaveBalance,
+)
+
+
+def _invalidate(kind, *ranges):
+    # 지금 한 번 + 커밋 후 한 번 (커밋 전 데이터로 버킷이 다시 채워지는 경우 대비)
+    invalidate_months(kind, *ranges)
+    transaction.on_commit(lambda: invalidate_months(kind, *ranges))
+
+
+def _previous(instance, *fields):
+    """수정 전 값 (새 행이면 None)"""
+    if instance.pk is None:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(post_save, sender=CompanyHoliday)
+@receiver(post_delete, sender=CompanyHoliday)
+def _company_holiday_changed(sender, instance, **kwargs):
+    # ✅ 관리자 공휴일 보정이 바뀌면 공휴일 테이블 다시 계산
+    holiday_table.invalidate()
+    _invalidate("holiday", (instance.date, instance.date))
+    bump_calendar_stamp((instance.date, instance.date))
+
+
+@receiver(pre_save, sender=CompanyHoliday)
+@receiver(pre_save, sender=LeaveRequest)
+@receiver(pre_save, sender=CalendarMemo)
+@receiver(pre_save, sender=CompDayGrant)
+def _remember_previous(sender, instance, **kwargs):
+    # 날짜가 바뀌면 예전 월 버킷도 지워야 하므로 수정 전 날짜를 기억
+    # (잔여 집계 증감용으로 수정 전 차감/발생량도 같이)
+    if sender is LeaveRequest:
+        instance._previous_dates = _previous(
+            instance, "start_date", "end_date", "leave_year_id", "used_comp", "used_annual", "employee_id"
+        )
+    elif sender is CompDayGrant:
+        instance._previous_grant = _previous(instance, "leave_year_id", "amount", "remaining", "worked_date")
+        instance.remaining = comp_alloc.grant_remaining(instance, instance._previous_grant)
+    elif sender is CalendarMemo:
+        instance._previous_dates = _previous(instance, "memo_date")
+    else:
+        prev = _previous(instance, "date")
+        if prev:
+            _invalidate("holiday", (prev["date"], prev["date"]))
+            bump_calendar_stamp((prev["date"], prev["date"]))
+
+
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def _leave_request_changed(sender, instance, **kwargs):
+    prev = getattr(instance, "_previous_dates", None) or {}
+    ranges = ((instance.start_date, instance.end_date), (prev.get("start_date"), prev.get("end_date")))
+    _invalidate("leave", *ranges)
+    # ✅ 삭제 / 다른 달로 이동은 updated_at 만으로 안 드러나므로 걸친 달의 카운터 증가
+    bump_calendar_stamp(*ranges)
+
+
+@receiver(post_save, sender=CalendarMemo)
+@receiver(post_delete, sender=CalendarMemo)
+def _calendar_memo_changed(sender, instance, **kwargs):
+    prev = getattr(instance, "_previous_dates", None) or {}
+    ranges = ((instance.memo_date, instance.memo_date), (prev.get("memo_date"), None))
+    _invalidate("memo", *ranges)
+    bump_calendar_stamp(*ranges)
+
+
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_save, sender=CalendarMemo)
+@receiver(post_delete, sender=LeaveRequest)
+@receiver(post_delete, sender=CalendarMemo)
+def _push_calendar_change(sender, instance, signal, created=False, **kwargs):
+    # ✅ 열린 달력에 알림 (커밋된 변경만, 순번이 커밋 순서대로 증가하도록 커밋 후 기록)
+    if signal is post_delete:
+        action = CalendarChange.Action.REMOVED
+    elif created:
+        action = CalendarChange.Action.ADDED
+    else:
+        action = CalendarChange.Action.CHANGED
+    fields = describe_change(instance, action)
+    transaction.on_commit(lambda: record_change(fields))
+
+
+@receiver(post_save, sender=Employee)
+def _employee_saved(sender, created, **kwargs):
+    # 이름이 달력 제목으로 나가므로 직원 수정도 달력 버전에 반영
+    if not created:
+        bump_calendar_stamp()
+        invalidate_all()
+
+
+## ===== ✅ 잔여 집계(LeaveBalance) 증감 =====
+def _cascade_from_parent(kwargs):
+    # 직원/LeaveYear 삭제로 같이 지워지는 경우 집계 행도 지워지므로 건너뜀
+    origin = kwargs.get("origin")
+    model = getattr(origin, "model", type(origin))
+    return model in (LeaveYear, Employee)
+
+
+@receiver(post_save, sender=LeaveYear)
+def _leave_year_created(sender, instance, created, **kwargs):
+    if created:
+        LeaveBalance.objects.get_or_create(leave_year=instance)
+
+
+@receiver(post_save, sender=LeaveRequest)
+def _leave_request_balance(sender, instance, created, **kwargs):
+    if instance.__dict__.pop("_balance_applied", False):
+        return  # services.submit_leave 에서 이미 반영 (ledger.compare_and_apply)
+    prev = getattr(instance, "_previous_dates", None)
+    if prev and prev["leave_year_id"] != instance.leave_year_id:
+        ledger.apply_delta(prev["leave_year_id"], used_comp=-prev["used_comp"], used_annual=-prev["used_annual"])
+        prev = None
+    ledger.apply_delta(
+        instance.leave_year_id,
+        used_comp=ledger.to_decimal(instance.used_comp) - (prev["used_comp"] if prev else 0),
+        used_annual=ledger.to_decimal(instance.used_annual) - (prev["used_annual"] if prev else 0),
+    )
+
+
+@receiver(pre_delete, sender=LeaveRequest)
+def _leave_request_stored_used(sender, instance, **kwargs):
+    # 메모리의 instance 는 예전 값일 수 있음 (rededuct 의 bulk_update 등) -> 저장된 차감량을 빼도록
+    if not _cascade_from_parent(kwargs):
+        stored = _previous(instance, "used_comp", "used_annual")
+        if stored:
+            instance.used_comp, instance.used_annual = stored["used_comp"], stored["used_annual"]
+
+
+@receiver(post_delete, sender=LeaveRequest)
+def _leave_request_balance_deleted(sender, instance, **kwargs):
+    if not _cascade_from_parent(kwargs):
+        ledger.apply_delta(
+            instance.leave_year_id,
+            used_comp=-ledger.to_decimal(instance.used_comp),
+            used_annual=-ledger.to_decimal(instance.used_annual),
+        )
+
+
+@receiver(post_save, sender=CompDayGrant)
+def _comp_grant_balance(sender, instance, created, **kwargs):
+    prev = getattr(instance, "_previous_grant", None)
+    if prev and prev["leave_year_id"] != instance.leave_year_id:
+        ledger.apply_delta(prev["leave_year_id"], comp_granted=-prev["amount"])
+        prev = None
+    ledger.apply_delta(
+        instance.leave_year_id,
+        comp_granted=ledger.to_decimal(instance.amount) - (prev["amount"] if prev else 0),
+    )
+
+
+@receiver(post_delete, sender=CompDayGrant)
+def _comp_grant_balance_deleted(sender, instance, **kwargs):
+    if not _cascade_from_parent(kwargs):
+        ledger.apply_delta(instance.leave_year_id, comp_granted=-ledger.to_decimal(instance.amount))
+
+
+## ===== ✅ 대체휴무 사용 배분(CompDayUse) =====
+@receiver(post_save, sender=LeaveRequest)
+def _leave_request_allocate(sender, instance, created, **kwargs):
+    prev = getattr(instance, "_previous_dates", None)
+    if not created:
+        if prev and prev["leave_year_id"] == instance.leave_year_id \
+                and ledger.to_decimal(prev["used_comp"]) == ledger.to_decimal(instance.used_comp):
+            return  # 대체휴무 차감량이 그대로면 배분도 그대로
+        comp_alloc.release(instance.pk)
+    comp_alloc.allocate(instance)
+
+
+@receiver(pre_delete, sender=LeaveRequest)
+def _leave_request_release(sender, instance, **kwargs):
+    # 신청 삭제 -> 썼던 발생분 되돌림 (LeaveYear/직원 삭제면 발생분도 같이 지워지므로 생략)
+    if not _cascade_from_parent(kwargs):
+        comp_alloc.release(instance.pk)
+
+
+## ===== ✅ 휴무 점유 비트맵(LeaveOccupancy) =====
+@receiver(post_save, sender=LeaveRequest)
+def _leave_request_occupancy(sender, instance, created, **kwargs):
+    if created:
+        occupancy.mark(instance)
+        return
+    prev = getattr(instance, "_previous_dates", None) or {}
+    occupancy.refresh(instance.employee_id, (instance.start_date, instance.end_date))
+    if prev.get("start_date"):
+        occupancy.refresh(prev["employee_id"], (prev["start_date"], prev["end_date"]))
+
+
+@receiver(post_delete, sender=LeaveRequest)
+def _leave_request_occupancy_deleted(sender, instance, **kwargs):
+    origin = kwargs.get("origin")
+    if getattr(origin, "model", type(origin)) is Employee:
+        return  # 직원 삭제면 비트맵도 같이 지워짐
+    occupancy.refresh(instance.employee_id, (instance.start_date, instance.end_date))
+
+
+## ===== ✅ 대체/연차 나눔 다시 계산 (소급 변경) =====
+def _since(since, leave_year_id, d):
+    if leave_year_id and d:
+        since[leave_year_id] = min(since.get(leave_year_id, d), d)
+
+
+@receiver(post_save, sender=CompDayGrant)
+def _comp_grant_rededuct(sender, instance, created, **kwargs):
+    prev = getattr(instance, "_previous_grant", None)
+    if prev and prev["leave_year_id"] == instance.leave_year_id and prev["worked_date"] == instance.worked_date \
+            and prev["amount"] == ledger.to_decimal(instance.amount):
+        return  # 메모/공휴일명만 수정
+    since = {}
+    _since(since, instance.leave_year_id, instance.worked_date)
+    if prev:
+        _since(since, prev["leave_year_id"], prev["worked_date"])
+    rededuct.rededuct(since, grants_changed=True)
+
+
+@receiver(post_delete, sender=CompDayGrant)
+def _comp_grant_rededuct_deleted(sender, instance, **kwargs):
+    if not _cascade_from_parent(kwargs):
+        rededuct.rededuct({instance.leave_year_id: instance.worked_date}, grants_changed=True)
+
+
+@receiver(post_save, sender=LeaveRequest)
+def _leave_request_rededuct(sender, instance, created, **kwargs):
+    # 새 신청은 제출 때 나눔 계산 / 날짜나 년도가 바뀐 수정만 그 이후 신청 다시 계산
+    prev = getattr(instance, "_previous_dates", None)
+    if created or not prev:
+        return
+    if prev["start_date"] == instance.start_date and prev["leave_year_id"] == instance.leave_year_id:
+        return
+    since = {}
+    _since(since, instance.leave_year_id, instance.start_date)
+    _since(since, prev["leave_year_id"], prev["start_date"])
+    rededuct.rededuct(since)
+
+
+@receiver(post_delete, sender=LeaveRequest)
+def _leave_request_rededuct_deleted(sender, instance, **kwargs):
+    # 삭제로 돌아온 대체휴무를 그 이후 신청이 쓰도록
+    if not _cascade_from_parent(kwargs):
+        rededuct.rededuct({instance.leave_year_id: instance.start_date})
@@ -1,3 +1,1133 @@
-from django.test import TestCase
+import io
+import json
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import (
+    business_days, calendar_events, comp_alloc, hll, holiday_table, leave_import, ledger, occupancy, outbox, rededuct,
+    services, view_metrics, visitor_counter,
+)
+from .models import (
+    CalendarMemo, ChatRateLimit, CompanyHoliday, CompDayGrant, CompDayUse, Employee, LeaveBalance, LeaveRequest,
+    LeaveYear, Notification, ViewMetric, VisitorStat,
+)
+from .utils.telegram import TelegramError
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class FlushBuffersMixin:
+    def tearDown(self):
+        # 메모리에 모인 방문자/응답시간 기록은 테스트 DB 에 반영 (종료 후 atexit 때는 DB 가 없음)
+        visitor_counter.flush()
+        view_metrics.flush()
+        super().tearDown()
+
+
+class LeavesTestCase(FlushBuffersMixin, TestCase):
+    pass
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EventsRangeTests(LeavesTestCase):
+    """달력 이벤트 기간 조회 (겹치는 휴무만, 넓은 기간은 나눠서)"""
+
+    def setUp(self):
+        emp = Employee.objects.create(name="기간", birth_yyMMdd="900101")
+        self.ids = {}
+        for start, end, units in (
+            (date(2026, 1, 5), date(2026, 1, 5), 1),
+            (date(2026, 2, 26), date(2026, 3, 3), 3),    # 2월~3월에 걸침
+            (date(2026, 3, 16), date(2026, 3, 16), 1),
+            (date(2026, 4, 6), date(2026, 4, 6), 1),
+        ):
+            leave = services.submit_leave(emp, LeaveRequest.LeaveType.ANNUAL, None, start, end, "", units)
+            self.ids[start] = leave.id
+
+    def test_only_overlapping_leaves(self):
+        events = self.client.get("/api/events/?start=2026-03-01&end=2026-04-01").json()
+        self.assertEqual(
+            sorted(e["id"] for e in events if isinstance(e["id"], int)),
+            [self.ids[date(2026, 2, 26)], self.ids[date(2026, 3, 16)]],
+        )
+        self.assertIn({"start": "2026-02-26", "end": "2026-03-04"}, [
+            {"start": e["start"], "end": e["end"]} for e in events if isinstance(e["id"], int)
+        ])
+
+    def test_chunked_query_yields_each_leave_once(self):
+        with mock.patch.object(calendar_events, "EVENTS_CHUNK_DAYS", 3):
+            rows = list(calendar_events.iter_leave_rows(date(2026, 2, 1), date(2026, 4, 6)))
+        self.assertEqual([r["id"] for r in rows], [self.ids[date(2026, 2, 26)], self.ids[date(2026, 3, 16)]])
+
+
+class HolidayTableTests(LeavesTestCase):
+    """공휴일 테이블 (한글 이름, 관리자 추가/제외)"""
+
+    def setUp(self):
+        holiday_table.invalidate()
+
+    def tearDown(self):
+        holiday_table.invalidate()
+        super().tearDown()
+
+    def test_english_names_translated(self):
+        self.assertEqual(holiday_table.to_ko_holiday_name("Alternative holiday for Chuseok"), "대체공휴일(추석)")
+        self.assertEqual(holiday_table.to_ko_holiday_name("Children's Day; Buddha's Birthday"), "어린이날, 부처님오신날")
+        self.assertEqual(holiday_table.to_ko_holiday_name("Something New"), "Something New")
+
+    def test_overrides_add_and_remove(self):
+        self.assertTrue(holiday_table.is_holiday(date(2026, 5, 5)))
+        CompanyHoliday.objects.create(date=date(2026, 5, 5), name="어린이날", is_off=False)
+        CompanyHoliday.objects.create(date=date(2026, 5, 20), name="창립기념일", is_off=True)
+        holiday_table.invalidate()
+
+        self.assertFalse(holiday_table.is_holiday(date(2026, 5, 5)))
+        self.assertEqual(holiday_table.holiday_name(date(2026, 5, 20)), "창립기념일")
+        self.assertEqual(
+            [d for d, _ in holiday_table.holidays_between(date(2026, 5, 1), date(2026, 6, 1))],
+            [date(2026, 5, 20), date(2026, 5, 24), date(2026, 5, 25)],
+        )
+
+    def test_table_reused_within_ttl(self):
+        table = holiday_table.year_table(2026)
+        with self.assertNumQueries(0):
+            self.assertIs(holiday_table.year_table(2026), table)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EventsFormatTests(LeavesTestCase):
+    """달력 이벤트 스트리밍 / 압축 형식"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="형식", birth_yyMMdd="900101")
+        self.full = services.submit_leave(
+            self.emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 9), date(2026, 3, 10), "", 2
+        )
+        self.half = services.submit_leave(
+            self.emp, LeaveRequest.LeaveType.HALF, LeaveRequest.HalfDay.PM, date(2026, 3, 12), date(2026, 3, 12), "", 0.5
+        )
+        self.memo = CalendarMemo.objects.create(memo_date=date(2026, 3, 20), title="점검", content="서버", color="red")
+
+    def test_stream_matches_full_response(self):
+        url = "/api/events/?start=2026-03-01&end=2026-04-01"
+        full = self.client.get(url).json()
+        with mock.patch.object(calendar_events, "EVENTS_STREAM_BATCH", 2):
+            resp = self.client.get(url + "&stream=1")
+        self.assertTrue(resp.streaming)
+        streamed = json.loads(b"".join(resp.streaming_content))
+        key = lambda e: str(e["id"])   # noqa: E731
+        self.assertEqual(sorted(streamed, key=key), sorted(full, key=key))
+
+    def test_stream_allows_wide_range(self):
+        resp = self.client.get("/api/events/?start=2025-01-01&end=2027-01-01&stream=1")
+        titles = [e["title"] for e in json.loads(b"".join(resp.streaming_content))]
+        self.assertEqual(titles.count("기독탄신일"), 2)   # 2025, 2026 (기본 최대 기간 400일을 넘음)
+
+    def test_compact_round_trip(self):
+        data = self.client.get("/api/events/?start=2026-03-01&end=2026-04-01&format=compact").json()
+        self.assertEqual(data["base"], "2026-03-01")
+        self.assertEqual(data["names"], ["형식"])
+        self.assertEqual(data["leave"], {
+            "id": [self.full.id, self.half.id], "e": [0, 0], "s": [8, 11], "n": [2, 1], "h": [0, 2],
+        })
+        self.assertEqual(data["memo"]["id"], [self.memo.id])
+        self.assertEqual(data["colors"][data["memo"]["k"][0]], "red")
+        self.assertEqual((data["memo"]["t"], data["memo"]["c"]), (["점검"], ["서버"]))
+        self.assertEqual(data["holiday"], {"s": [0, 1], "t": ["삼일절", "삼일절 대체 휴일"]})
+
+    def test_formats_have_different_etags(self):
+        url = "/api/events/?start=2026-03-01&end=2026-04-01"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url + "&format=compact", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EventsConditionalGetTests(LeavesTestCase):
+    """달력 이벤트 조건부 GET (ETag / 304)"""
+
+    url = "/api/events/?start=2026-03-01&end=2026-04-01"
+
+    def test_memo_edit_changes_etag(self):
+        CalendarMemo.objects.create(memo_date=date(2026, 3, 10), title="점검", content="처음", color="green")
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # memo_new 의 같은 날짜+제목 = 수정 경로 (update_fields 저장)
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.login(username="admin", password="pw")
+        self.client.post("/manage/memo/new/", {
+            "memo_date": "2026-03-10", "title": "점검", "content": "바뀜", "color": "red",
+        })
+        self.client.logout()
+
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], etag)
+        memo = next(e for e in second.json() if e["id"].startswith("memo-"))
+        self.assertEqual(memo["extendedProps"]["memoContent"], "바뀜")
+        self.assertIn("memo-red", memo["classNames"])
+
+
+    def test_other_month_write_keeps_304(self):
+        CalendarMemo.objects.create(memo_date=date(2026, 3, 10), title="점검", content="", color="green")
+        etag = self.client.get(self.url)["ETag"]
+
+        # 다른 달 휴무 신청 / 메모 삭제 -> 3월 달력은 그대로
+        emp = Employee.objects.create(name="다른달", birth_yyMMdd="900101")
+        services.submit_leave(emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 5, 4), date(2026, 5, 4), "", 1)
+        CalendarMemo.objects.create(memo_date=date(2026, 6, 1), title="지움", content="", color="green").delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # 3월 -> 5월로 옮기면 (updated_at 없는 저장이어도) 3월 달력이 바뀜
+        leave = LeaveRequest.objects.get(employee=emp)
+        leave.start_date = leave.end_date = date(2026, 3, 16)
+        leave.save()
+        etag = self.client.get(self.url)["ETag"]
+        leave.start_date = leave.end_date = date(2026, 5, 6)
+        leave.save(update_fields=["start_date", "end_date"])
+        moved = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(moved.status_code, 200)
+        self.assertFalse(any(e["id"] == leave.id for e in moved.json()))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MonthCacheTests(LeavesTestCase):
+    """달력 월 버킷 캐시 무효화"""
+
+    def setUp(self):
+        cache.clear()
+        holiday_table.invalidate()
+
+    def _titles(self, start, end):
+        return {e["title"] for e in calendar_events.build_events(start, end)}
+
+    def test_write_invalidates_only_its_month(self):
+        march = (date(2026, 3, 1), date(2026, 4, 1))
+        emp = Employee.objects.create(name="캐시", birth_yyMMdd="900101")
+        self._titles(*march)
+        with self.assertNumQueries(0):
+            self._titles(*march)
+
+        services.submit_leave(emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 5, 4), date(2026, 5, 4), "", 1)
+        with self.assertNumQueries(0):
+            self.assertNotIn("캐시", self._titles(*march))
+
+        services.submit_leave(emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 9), date(2026, 3, 9), "", 1)
+        self.assertIn("캐시", self._titles(*march))
+
+    def test_late_write_of_stale_bucket_is_not_served(self):
+        march = (date(2026, 3, 1), date(2026, 4, 1))
+        CalendarMemo.objects.create(memo_date=date(2026, 3, 3), title="처음", content="", color="green")
+        builders = dict(calendar_events._BUCKET_BUILDERS)
+        build_memo = builders["memo"]
+
+        def slow_reader(start, end):
+            # 버킷을 만드는 사이 다른 요청이 메모 추가 (무효화가 저장보다 먼저)
+            stale = build_memo(start, end)
+            CalendarMemo.objects.create(memo_date=date(2026, 3, 4), title="나중", content="", color="green")
+            return stale
+
+        with mock.patch.dict(calendar_events._BUCKET_BUILDERS, memo=slow_reader):
+            self.assertNotIn("나중", self._titles(*march))
+        self.assertIn("나중", self._titles(*march))
+
+    def test_holiday_override_version_in_key(self):
+        may = (date(2026, 5, 1), date(2026, 6, 1))
+        self.assertNotIn("창립기념일", self._titles(*may))
+        # 시그널 없이 추가 (다른 워커에서 바뀐 경우) -> 등록분 다시 읽으면 캐시도 새 키
+        CompanyHoliday.objects.bulk_create([CompanyHoliday(date=date(2026, 5, 20), name="창립기념일", is_off=True)])
+        holiday_table.invalidate()
+        self.assertIn("창립기념일", self._titles(*may))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EventsChangesSyncTests(LeavesTestCase):
+    """동기 워커의 변경 알림은 SSE 없이 짧은 polling"""
+
+    def test_sync_view_does_not_hold_worker(self):
+        started = time.monotonic()
+        resp = self.client.get("/api/events/changes/?start=2026-03-01&end=2026-04-01")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(resp["Content-Type"], "application/json")
+        data = resp.json()
+        self.assertEqual(data["changes"], [])
+        self.assertGreater(data["retry"], 0)
+
+        # 변경 없음 -> 304 (본문 없이)
+        resp = self.client.get(
+            f"/api/events/changes/?since={data['last']}", HTTP_IF_NONE_MATCH=f'"{data["last"]}"'
+        )
+        self.assertEqual(resp.status_code, 304)
+
+    def test_sync_poll_returns_new_change(self):
+        since = self.client.get("/api/events/changes/").json()["last"]
+        with self.captureOnCommitCallbacks(execute=True):
+            memo = CalendarMemo.objects.create(memo_date=date(2026, 3, 10), title="점검", content="x")
+        data = self.client.get(f"/api/events/changes/?since={since}&start=2026-03-01&end=2026-04-01").json()
+        self.assertEqual([c["id"] for c in data["changes"]], [f"memo-{memo.id}"])
+
+
+class CompGrantTests(LeavesTestCase):
+    """대체휴무 발생 등록 (같은 날짜+공휴일은 한 건)"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="발생", birth_yyMMdd="900101")
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.login(username="admin", password="pw")
+
+    def _post(self, amount):
+        resp = self.client.post(f"/manage/comp/new/{self.emp.id}/2026/", {
+            "worked_date": "2026-05-05", "holiday_name": "어린이날", "amount": amount,
+        })
+        self.assertEqual(resp.status_code, 302)
+        page = self.client.get(resp["Location"].replace(settings.FORCE_SCRIPT_NAME or "", "", 1))
+        return [str(m) for m in page.context["messages"]]
+
+    def test_duplicate_grant_is_reported(self):
+        self.assertEqual(self._post("1.0"), ["대체휴무 발생이 등록되었습니다."])
+        self.assertIn("변경하지 않았습니다", self._post("1.0")[0])
+        self.assertIn("1.0 -> 0.5", self._post("0.5")[0])
+        self.assertEqual(list(CompDayGrant.objects.values_list("amount", flat=True)), [Decimal("0.5")])
+
+
+class BulkCompGrantTests(LeavesTestCase):
+    """대체휴무 일괄 발생 (쿼리 수 고정, 같은 공휴일은 한 건으로 갱신)"""
+
+    def _grant(self, ids, amount="1.0"):
+        with CaptureQueriesContext(connection) as ctx:
+            services.grant_comp_days(ids, 2026, date(2026, 5, 5), "어린이날", amount)
+        return len(ctx.captured_queries)
+
+    def test_query_count_independent_of_employees(self):
+        few = [Employee.objects.create(name=f"소{i}", birth_yyMMdd="900101").id for i in range(2)]
+        many = [Employee.objects.create(name=f"다{i}", birth_yyMMdd="900101").id for i in range(12)]
+        self.assertEqual(self._grant(few), self._grant(many))
+        self.assertEqual(CompDayGrant.objects.count(), 14)
+        self.assertEqual(ledger.verify(), [])
+
+    def test_regrant_updates_amount_and_keeps_usage(self):
+        emp = Employee.objects.create(name="재발생", birth_yyMMdd="900101")
+        self._grant([emp.id])
+        leave = services.submit_leave(emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 5, 11), date(2026, 5, 11), "", 1)
+        self.assertEqual(leave.used_comp, Decimal("1.0"))
+
+        self._grant([emp.id], "1.5")
+        self._grant([emp.id], "1.5")
+        grant = CompDayGrant.objects.get()
+        self.assertEqual((grant.amount, grant.remaining), (Decimal("1.5"), Decimal("0.5")))
+        self.assertEqual(ledger.verify(), [])
+
+    def test_bulk_view(self):
+        ids = [Employee.objects.create(name=f"화면{i}", birth_yyMMdd="900101").id for i in range(3)]
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.login(username="admin", password="pw")
+        resp = self.client.post("/manage/comp/bulk/2026/", {
+            "employees": ids, "worked_date": "2026-05-05", "holiday_name": "어린이날", "amount": "1.0", "memo": "",
+        })
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(
+            sorted(CompDayGrant.objects.values_list("leave_year__employee_id", flat=True)), sorted(ids)
+        )
+
+
+@override_settings(TELEGRAM_BOT_TOKEN="t", TELEGRAM_CHAT_ID="100")
+class OutboxTests(LeavesTestCase):
+    """알림 보낼 함 (신청과 같은 트랜잭션, 재시도 간격)"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="알림", birth_yyMMdd="900101")
+
+    def _make_due(self):
+        Notification.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def _submit(self, day, notice):
+        return services.submit_leave(self.emp, LeaveRequest.LeaveType.ANNUAL, None, day, day, "", 1, notice=notice)
+
+    def test_notice_follows_submission(self):
+        with mock.patch("leaves.outbox.deliver") as deliver:
+            self._submit(date(2026, 3, 9), "첫 신청")
+            with self.assertRaises(services.DuplicateLeave):
+                self._submit(date(2026, 3, 9), "중복")   # 롤백 -> 알림도 없음
+        deliver.assert_not_called()
+        self.assertEqual(list(Notification.objects.values_list("text", "status")), [("첫 신청", "pending")])
+
+        self.assertEqual(outbox.deliver_due(), (0, 0, 0))   # 묶음 시간 전
+        self._make_due()
+        with mock.patch("leaves.outbox.deliver") as deliver:
+            out = io.StringIO()
+            call_command("send_notifications", "--once", stdout=out)
+        deliver.assert_called_once_with("첫 신청", "100")
+        self.assertIn("전송 1", out.getvalue())
+        self.assertEqual(Notification.objects.get().status, Notification.Status.SENT)
+
+    def test_retry_backoff_and_give_up(self):
+        notice = outbox.enqueue("재시도")
+        for attempt in range(1, outbox.OUTBOX_MAX_ATTEMPTS + 1):
+            self._make_due()
+            ChatRateLimit.objects.all().delete()   # 속도 제한과 무관하게
+            before = timezone.now()
+            with mock.patch("leaves.outbox.deliver", side_effect=TelegramError("timeout")), \
+                    self.assertLogs("leaves.outbox", "ERROR") if attempt == outbox.OUTBOX_MAX_ATTEMPTS else nullcontext():
+                result = outbox.deliver_due()
+            notice.refresh_from_db()
+            self.assertEqual(notice.attempts, attempt)
+            if attempt < outbox.OUTBOX_MAX_ATTEMPTS:
+                self.assertEqual(result, (0, 1, 0))
+                wait = (notice.next_attempt_at - before).total_seconds()
+                self.assertGreaterEqual(wait, 2 ** attempt - 0.01)
+            else:
+                self.assertEqual(result, (0, 0, 1))
+        self.assertEqual(notice.status, Notification.Status.FAILED)
+        self.assertEqual(notice.last_error, "timeout")
+
+    def test_permanent_error_and_retry_after(self):
+        bad = outbox.enqueue("설정 오류", chat_id="200")
+        slow = outbox.enqueue("나중에", chat_id="300")
+        self._make_due()
+
+        def fail(text, chat_id):
+            if chat_id == "200":
+                raise TelegramError("403", permanent=True)
+            raise TelegramError("429", retry_after=30)
+
+        with mock.patch("leaves.outbox.deliver", side_effect=fail), self.assertLogs("leaves.outbox", "ERROR"):
+            self.assertEqual(outbox.deliver_due(), (0, 1, 1))
+        bad.refresh_from_db()
+        slow.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (Notification.Status.FAILED, 1))
+        self.assertGreater((slow.next_attempt_at - timezone.now()).total_seconds(), 29)
+        self.assertGreater(outbox.take_token("300"), 29)   # 채팅방도 쉬는 중
+
+    def test_backoff_is_capped(self):
+        for attempts in (1, 5):
+            seconds = outbox.backoff(attempts).total_seconds()
+            self.assertTrue(2 ** attempts <= seconds <= 2 ** attempts * 1.25)
+        self.assertLessEqual(outbox.backoff(30).total_seconds(), outbox.OUTBOX_BACKOFF_MAX_SECONDS * 1.25)
+
+    def test_start_runs_one_thread(self):
+        with mock.patch.object(outbox, "_thread", None), mock.patch("leaves.outbox.threading.Thread") as thread:
+            outbox.start()
+            outbox.start()
+        thread.assert_called_once()
+        self.assertIs(thread.call_args.kwargs["target"], outbox.run_worker)
+        thread.return_value.start.assert_called_once()
+
+
+@override_settings(TELEGRAM_BOT_TOKEN="t", TELEGRAM_CHAT_ID="100")
+class TelegramRateLimitTests(LeavesTestCase):
+    """채팅방별 전송 속도 제한 (DB 공유 버킷)"""
+
+    def test_bucket_is_shared_through_db(self):
+        for _ in range(outbox.TELEGRAM_BURST):
+            self.assertEqual(outbox.take_token("100"), 0.0)
+        wait = outbox.take_token("100")
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 60 / outbox.TELEGRAM_RATE_PER_MINUTE + 0.01)
+        # 다른 채팅방은 따로
+        self.assertEqual(outbox.take_token("200"), 0.0)
+
+    def _make_due(self):
+        Notification.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def test_notices_coalesce_per_chat(self):
+        for text in ("가 신청", "나 신청", "다 신청"):
+            outbox.enqueue(text)
+        outbox.enqueue("다른 방", chat_id="200")
+        self._make_due()
+        with mock.patch("leaves.outbox.deliver") as deliver:
+            self.assertEqual(outbox.deliver_due(), (4, 0, 0))
+        self.assertEqual(sorted(deliver.call_args_list), sorted([
+            mock.call("가 신청\n\n나 신청\n\n다 신청", "100"),
+            mock.call("다른 방", "200"),
+        ]))
+
+    def test_digest_respects_message_limit(self):
+        rows = [Notification(text="x" * 1500) for _ in range(5)]
+        self.assertEqual([len(g) for g in outbox.digests(rows)], [2, 2, 1])
+        self.assertTrue(all(len(outbox.digest_text(g)) <= outbox.TELEGRAM_MAX_CHARS for g in outbox.digests(rows)))
+
+    def test_out_of_tokens_defers_without_attempt(self):
+        rows = [outbox.enqueue("y" * 3000) for _ in range(outbox.TELEGRAM_BURST + 2)]
+        self._make_due()
+        with mock.patch("leaves.outbox.deliver") as deliver:
+            self.assertEqual(outbox.deliver_due(), (outbox.TELEGRAM_BURST, 2, 0))
+        self.assertEqual(deliver.call_count, outbox.TELEGRAM_BURST)
+        deferred = Notification.objects.filter(pk__in=[n.pk for n in rows[-2:]])
+        self.assertEqual({(n.status, n.attempts) for n in deferred}, {(Notification.Status.PENDING, 0)})
+        self.assertTrue(all(n.next_attempt_at > timezone.now() for n in deferred))
+
+    def test_pause_after_429(self):
+        outbox.pause_chat("100", 30)
+        self.assertGreater(outbox.take_token("100"), 29)
+        self.assertEqual(ChatRateLimit.objects.get(chat_id="100").tokens, 0)
+
+    def test_send_telegram_goes_through_outbox(self):
+        from .utils.telegram import send_telegram
+
+        with mock.patch("leaves.utils.telegram._session") as session:
+            self.assertTrue(send_telegram("안내"))
+        session.assert_not_called()
+        self.assertEqual(list(Notification.objects.values_list("text", "status")), [("안내", "pending")])
+
+
+class OccupancyTests(LeavesTestCase):
+    """중복 신청 확인 (점유 비트맵)"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="반차", birth_yyMMdd="900101")
+
+    def _submit(self, leave_type, half_day, start, end, units):
+        return services.submit_leave(self.emp, leave_type, half_day, start, end, "", units)
+
+    def test_half_days_on_same_date_conflict(self):
+        day = date(2026, 6, 3)
+        self._submit(LeaveRequest.LeaveType.HALF, LeaveRequest.HalfDay.AM, day, day, 0.5)
+        with self.assertRaises(services.DuplicateLeave):
+            self._submit(LeaveRequest.LeaveType.HALF, LeaveRequest.HalfDay.PM, day, day, 0.5)
+        self._submit(LeaveRequest.LeaveType.HALF, LeaveRequest.HalfDay.PM, date(2026, 6, 4), date(2026, 6, 4), 0.5)
+        self.assertTrue(occupancy.is_off(self.emp.id, day, occupancy.AM))
+        self.assertFalse(occupancy.is_off(self.emp.id, day, occupancy.PM))
+
+    def test_range_overlap_across_year_end(self):
+        self._submit(LeaveRequest.LeaveType.ANNUAL, None, date(2026, 12, 30), date(2027, 1, 2), 2)
+        with self.assertRaises(services.DuplicateLeave):
+            self._submit(LeaveRequest.LeaveType.ANNUAL, None, date(2027, 1, 1), date(2027, 1, 5), 2)
+        leave = LeaveRequest.objects.get(employee=self.emp)
+        leave.delete()
+        self.assertEqual(occupancy.load(self.emp.id, [2026, 2027]), {2026: 0, 2027: 0})
+
+    def test_edit_moves_bits(self):
+        leave = self._submit(LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 9), date(2026, 3, 10), 2)
+        leave.start_date = leave.end_date = date(2026, 3, 12)
+        leave.save()
+        self.assertFalse(occupancy.is_off(self.emp.id, date(2026, 3, 9)))
+        self.assertTrue(occupancy.is_off(self.emp.id, date(2026, 3, 12)))
+        self.assertEqual(occupancy.load(self.emp.id, [2026])[2026], occupancy.compute(self.emp.id, 2026))
+
+    def test_conflict_check_is_one_query(self):
+        self._submit(LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 9), date(2026, 3, 10), 2)
+        with self.assertNumQueries(1):
+            self.assertTrue(occupancy.conflicts(
+                self.emp.id, LeaveRequest.LeaveType.HALF, LeaveRequest.HalfDay.PM, date(2026, 3, 10), date(2026, 3, 10)
+            ))
+        with self.assertNumQueries(1):
+            self.assertFalse(occupancy.conflicts(
+                self.emp.id, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 11), date(2026, 3, 13)
+            ))
+
+
+class BusinessDaysTests(LeavesTestCase):
+    """영업일 계산 (주말/공휴일 제외, 관리자 등록분 반영)"""
+
+    def setUp(self):
+        holiday_table.invalidate()
+
+    def tearDown(self):
+        holiday_table.invalidate()
+        super().tearDown()
+
+    def test_matches_day_by_day_count(self):
+        first = date(2025, 12, 20)
+        for offset in range(0, 60, 3):
+            start = date.fromordinal(first.toordinal() + offset)
+            for length in (0, 1, 4, 6, 13, 40):
+                end = date.fromordinal(start.toordinal() + length)
+                expected = sum(
+                    1 for n in range(start.toordinal(), end.toordinal() + 1)
+                    if date.fromordinal(n).weekday() < 5 and not holiday_table.is_holiday(date.fromordinal(n))
+                )
+                self.assertEqual(business_days.business_days(start, end), expected, (start, end))
+
+    def test_holidays_and_overrides(self):
+        # 2026-02-16~18 설 연휴(월~수), 02-21~22 주말
+        self.assertEqual(business_days.business_days(date(2026, 2, 16), date(2026, 2, 22)), 2)
+        self.assertEqual(business_days.business_days(date(2026, 2, 22), date(2026, 2, 16)), 2)
+        CompanyHoliday.objects.create(date=date(2026, 2, 19), name="회사 휴무", is_off=True)
+        holiday_table.invalidate()
+        self.assertEqual(business_days.business_days(date(2026, 2, 16), date(2026, 2, 22)), 1)
+
+    def test_leave_units(self):
+        rows = [
+            ("ANNUAL", date(2026, 3, 2), date(2026, 3, 6)),   # 3/2 대체공휴일
+            ("HALF", date(2026, 3, 3), date(2026, 3, 3)),
+            ("ANNUAL", date(2026, 3, 7), None),               # 토요일 하루
+        ]
+        self.assertEqual(business_days.leave_units_batch(rows), [Decimal("4"), Decimal("0.5"), Decimal("0")])
+        self.assertEqual(business_days.leave_units_batch(rows), [business_days.leave_units(*r) for r in rows])
+
+
+class YearBalanceTests(LeavesTestCase):
+    """년도 잔여 일괄 계산 (직원 수와 무관한 쿼리 수)"""
+
+    def setUp(self):
+        self.used = Employee.objects.create(name="가사용", birth_yyMMdd="900101")
+        services.grant_comp_days([self.used.id], 2026, date(2026, 1, 1), "신정", "1.0")
+        LeaveYear.objects.filter(employee=self.used, year=2026).update(base_days=15, carry_over=2)
+        services.submit_leave(self.used, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 9), date(2026, 3, 10), "", 2)
+        self.none = Employee.objects.create(name="나없음", birth_yyMMdd="900101")
+
+    def test_values(self):
+        used, none = services.year_balances(2026)
+        self.assertEqual(used.employee, self.used)
+        self.assertEqual(
+            (used.total_annual, used.comp_granted, used.used_comp, used.used_annual, used.remain),
+            (Decimal("17.0"), Decimal("1.0"), Decimal("1.0"), Decimal("1.0"), Decimal("16.0")),
+        )
+        self.assertEqual([g["holiday_name"] for g in used.comp_grants], ["신정"])
+        self.assertIsNone(none.leave_year_id)
+        self.assertEqual((none.remain, none.comp_grants), (Decimal("0.0"), []))
+        self.assertFalse(LeaveYear.objects.filter(employee=self.none).exists())
+
+    def test_query_count_independent_of_employees(self):
+        with self.assertNumQueries(2):
+            services.year_balances(2026)
+        for i in range(5):
+            emp = Employee.objects.create(name=f"추가{i}", birth_yyMMdd="900101")
+            services.grant_comp_days([emp.id], 2026, date(2026, 1, 1), "신정", "1.0")
+        with self.assertNumQueries(2):
+            self.assertEqual(len(services.year_balances(2026)), 7)
+
+    def test_admin_summary_page(self):
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.login(username="admin", password="pw")
+        resp = self.client.get("/manage/summary/2026/")
+        self.assertEqual(resp.status_code, 200)
+        row = next(r for r in resp.context["rows"] if r["emp"] == self.used)
+        self.assertEqual(row["remain_total"], 16.0)
+
+
+class LedgerTests(LeavesTestCase):
+    """잔여 집계(LeaveBalance) 증감 / 검증 / 다시 계산"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="집계", birth_yyMMdd="900101")
+        services.grant_comp_days([self.emp.id], 2026, date(2026, 1, 1), "신정", "1.0")
+        self.ly = LeaveYear.objects.get(employee=self.emp, year=2026)
+
+    def _balance(self):
+        b = LeaveBalance.objects.get(leave_year=self.ly)
+        return b.comp_granted, b.used_comp, b.used_annual
+
+    def test_signals_keep_balance_in_sync(self):
+        leave = services.submit_leave(self.emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 9), date(2026, 3, 10), "", 2)
+        self.assertEqual(self._balance(), (Decimal("1"), Decimal("1"), Decimal("1")))
+        CompDayGrant.objects.create(leave_year=self.ly, worked_date=date(2026, 2, 17), holiday_name="설날", amount="1.0")
+        leave.delete()
+        self.assertEqual(self._balance(), (Decimal("2"), Decimal("0"), Decimal("0")))
+        self.assertEqual(ledger.verify(), [])
+
+    def test_rebuild_command_fixes_drift(self):
+        services.submit_leave(self.emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 9), date(2026, 3, 9), "", 1)
+        LeaveRequest.objects.update(used_annual=Decimal("0.5"))   # 시그널 없는 변경
+        (mismatch,) = ledger.verify()
+        self.assertEqual(mismatch[0], self.ly.id)
+
+        out = io.StringIO()
+        with self.assertRaises(SystemExit):
+            call_command("rebuild_balances", "--check", stdout=out, stderr=io.StringIO())
+        self.assertIn(f"LeaveYear #{self.ly.id}", out.getvalue())
+        call_command("rebuild_balances", stdout=io.StringIO())
+        self.assertEqual(ledger.verify(), [])
+        self.assertEqual(self._balance(), (Decimal("1"), Decimal("1"), Decimal("0.5")))
+
+
+class BalanceMemoTests(LeavesTestCase):
+    """요청 1건 안에서 잔여 집계는 LeaveYear 당 한 번만 조회"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="메모", birth_yyMMdd="900101")
+        services.grant_comp_days([self.emp.id], 2026, date(2026, 1, 1), "신정", "1.0")
+        self.ly = LeaveYear.objects.get(employee=self.emp, year=2026)
+
+    def test_one_query_per_leave_year(self):
+        with ledger.request_memo() as memo:
+            with self.assertNumQueries(1):
+                for _ in range(3):
+                    self.assertEqual(ledger.get_balance(self.ly).comp_granted, Decimal("1"))
+            self.assertEqual(memo.saved, 2)
+            # 같은 요청 안에서 증감하면 다시 읽음
+            ledger.apply_delta(self.ly.id, used_comp=Decimal("1"))
+            self.assertEqual(ledger.get_balance(self.ly).used_comp, Decimal("1"))
+        with self.assertNumQueries(0):
+            ledger.get_balance(services.empty_leave_year(self.emp, 2030))
+
+    @override_settings(DEBUG=True)
+    def test_middleware_reports_saved_queries(self):
+        resp = self.client.get(f"/me/{self.emp.id}/?year=2026")
+        self.assertEqual(resp.status_code, 200)
+        self.assertGreaterEqual(int(resp["X-Balance-Queries-Saved"]), 1)
+
+
+class ReadOnlyPagesTests(LeavesTestCase):
+    """조회 화면은 LeaveYear 를 만들지 않음 (생성은 신청/발생 저장, provision_years)"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="조회", birth_yyMMdd="900101")
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+
+    def test_get_pages_do_not_create_leave_years(self):
+        urls = [
+            f"/me/{self.emp.id}/?year=2031",
+            f"/staff/{self.emp.id}/?year=2031",
+            f"/employee/{self.emp.id}/?year=2031",
+        ]
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+        self.client.login(username="admin", password="pw")
+        for url in (f"/manage/employee/{self.emp.id}/2031/", "/manage/employees/?year=2031", "/manage/summary/2031/"):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+        self.assertFalse(LeaveYear.objects.exists())
+
+    def test_provision_years(self):
+        Employee.objects.create(name="퇴사", birth_yyMMdd="900101", is_active=False)
+        call_command("provision_years", "2031", "2032", stdout=io.StringIO())
+        call_command("provision_years", "2031", stdout=io.StringIO())   # 두 번 실행해도 그대로
+        self.assertEqual(
+            sorted(LeaveYear.objects.values_list("employee__name", "year")), [("조회", 2031), ("조회", 2032)]
+        )
+        self.assertEqual(LeaveBalance.objects.count(), 2)
+
+
+class MonthlyUsageTests(LeavesTestCase):
+    """직원 x 월 사용표 (여러 달에 걸친 신청은 영업일 기준으로 나눔)"""
+
+    def test_split_across_months_and_year_end(self):
+        emp = Employee.objects.create(name="월별", birth_yyMMdd="900101")
+        other = Employee.objects.create(name="안씀", birth_yyMMdd="900101")
+        for start, end, units in (
+            (date(2026, 3, 30), date(2026, 4, 2), 4),     # 3월 2일 + 4월 2일
+            (date(2026, 4, 15), date(2026, 4, 15), 1),
+            (date(2026, 12, 30), date(2027, 1, 4), 3),    # 1/1 공휴일, 주말 제외 -> 12월 2일 + 1월 1일
+        ):
+            services.submit_leave(emp, LeaveRequest.LeaveType.ANNUAL, None, start, end, "", units)
+
+        with self.assertNumQueries(2):
+            table = services.monthly_used_by_employee(2026, [emp.id, other.id])
+        row = table[emp.id]
+        self.assertEqual(
+            (row["2026-03"], row["2026-04"], row["2026-12"], row["2027-01"]),
+            (Decimal("2.0"), Decimal("3.0"), Decimal("2.0"), Decimal("1.0")),
+        )
+        self.assertEqual(sum(row.values()), Decimal("8.0"))
+        self.assertEqual(set(table[other.id].values()), {Decimal("0.0")})
+        self.assertEqual(len(table[other.id]), 12)
+
+    def test_extra_units_go_to_last_month(self):
+        # 주말까지 차감한 예전 기록: 영업일보다 많은 양은 마지막 달에
+        self.assertEqual(
+            services.split_by_month(date(2026, 1, 31), date(2026, 2, 1), 2),
+            [("2026-01", Decimal("0")), ("2026-02", Decimal("2"))],
+        )
+
+
+class CompAllocationTests(LeavesTestCase):
+    """대체휴무 사용 배분 (근무일이 오래된 발생분부터)"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="배분", birth_yyMMdd="900101")
+        services.grant_comp_days([self.emp.id], 2026, date(2026, 2, 17), "설날", "1.0")
+        services.grant_comp_days([self.emp.id], 2026, date(2026, 1, 1), "신정", "0.5")
+
+    def _uses(self):
+        return sorted(
+            CompDayUse.objects.values_list("leave_request_id", "grant__holiday_name", "amount")
+        )
+
+    def _remaining(self):
+        return dict(CompDayGrant.objects.values_list("holiday_name", "remaining"))
+
+    def _submit(self, start, end, units):
+        return services.submit_leave(self.emp, LeaveRequest.LeaveType.ANNUAL, None, start, end, "", units)
+
+    def test_fifo_by_worked_date(self):
+        first = self._submit(date(2026, 3, 9), date(2026, 3, 9), 1)
+        self.assertEqual(self._uses(), [(first.id, "설날", Decimal("0.5")), (first.id, "신정", Decimal("0.5"))])
+        self.assertEqual(self._remaining(), {"신정": Decimal("0"), "설날": Decimal("0.5")})
+
+        second = self._submit(date(2026, 3, 16), date(2026, 3, 16), 1)
+        self.assertEqual(second.used_comp, Decimal("0.5"))
+        self.assertEqual(self._remaining(), {"신정": Decimal("0"), "설날": Decimal("0")})
+
+        # 앞 신청 삭제 -> 되돌린 발생분을 뒤 신청이 씀 (rededuct), 배분도 다시 오래된 순
+        first.delete()
+        second.refresh_from_db()
+        self.assertEqual(second.used_comp, Decimal("1.0"))
+        self.assertEqual(self._uses(), [(second.id, "설날", Decimal("0.5")), (second.id, "신정", Decimal("0.5"))])
+        self.assertEqual(self._remaining(), {"신정": Decimal("0"), "설날": Decimal("0.5")})
+
+    def test_reallocate_matches_incremental(self):
+        first = self._submit(date(2026, 3, 9), date(2026, 3, 9), 1)
+        self._submit(date(2026, 3, 16), date(2026, 3, 16), 1)
+        before, remaining = self._uses(), self._remaining()
+        comp_alloc.reallocate([first.leave_year_id])
+        self.assertEqual((self._uses(), self._remaining()), (before, remaining))
+
+
+class RedeductTests(LeavesTestCase):
+    """소급 발생/삭제 -> 그 날짜 이후 신청만 대체/연차 다시 나눔"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="소급", birth_yyMMdd="900101")
+        submit = lambda leave_type, half_day, d, units: services.submit_leave(  # noqa: E731
+            self.emp, leave_type, half_day, d, d, "", units
+        )
+        self.before = submit(LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 9), 1)
+        self.half = submit(LeaveRequest.LeaveType.HALF, LeaveRequest.HalfDay.AM, date(2026, 3, 12), 0.5)
+        self.after = submit(LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 16), 1)
+        self.ly = self.before.leave_year
+
+    def _split(self):
+        return {
+            r.start_date.day: (r.used_comp, r.used_annual)
+            for r in LeaveRequest.objects.filter(employee=self.emp)
+        }
+
+    def test_retroactive_grant_and_delete(self):
+        one, zero, half = Decimal("1"), Decimal("0"), Decimal("0.5")
+        self.assertEqual(self._split(), {9: (zero, one), 12: (zero, half), 16: (zero, one)})
+
+        grant = CompDayGrant.objects.create(
+            leave_year=self.ly, worked_date=date(2026, 3, 10), holiday_name="", amount="1.0"
+        )
+        # 3/9 는 기준일 이전이라 그대로, 반차는 연차만
+        self.assertEqual(self._split(), {9: (zero, one), 12: (zero, half), 16: (one, zero)})
+        self.assertEqual(list(CompDayUse.objects.values_list("leave_request_id", flat=True)), [self.after.id])
+        self.assertEqual(ledger.verify(), [])
+
+        grant.delete()
+        self.assertEqual(self._split(), {9: (zero, one), 12: (zero, half), 16: (zero, one)})
+        self.assertFalse(CompDayUse.objects.exists())
+        self.assertEqual(ledger.verify(), [])
+
+    def test_only_changed_rows_are_written(self):
+        CompDayGrant.objects.bulk_create([
+            CompDayGrant(leave_year=self.ly, worked_date=date(2026, 3, 1), holiday_name="삼일절", amount="1.0", remaining="1.0")
+        ])
+        self.assertEqual(rededuct.rededuct({self.ly.id: date(2026, 3, 1)}, grants_changed=True), 1)
+        self.assertEqual(self._split()[9], (Decimal("1"), Decimal("0")))
+        self.assertEqual(rededuct.rededuct({self.ly.id: date(2026, 3, 1)}), 0)
+
+
+class VisitorCounterTests(LeavesTestCase):
+    """방문 수는 메모리에 모았다가 한 번에 반영"""
+
+    def setUp(self):
+        visitor_counter.flush()
+
+    def _count(self, day):
+        return VisitorStat.objects.filter(date=day).values_list("count", flat=True).first()
+
+    def test_hits_are_buffered_and_flushed_once(self):
+        day = date(2026, 3, 9)
+        with mock.patch.object(visitor_counter, "VISITOR_FLUSH_EVERY", 5), \
+                mock.patch.object(visitor_counter, "VISITOR_FLUSH_SECONDS", 3600):
+            with self.assertNumQueries(0):
+                due = [visitor_counter.hit(day, f"ip{i}") for i in range(5)]
+        self.assertEqual(due, [False] * 4 + [True])
+        self.assertEqual(visitor_counter.flush(), 5)
+        visitor_counter.hit(day, "ip0")
+        visitor_counter.flush()
+        self.assertEqual(self._count(day), 6)
+        self.assertEqual(VisitorStat.objects.count(), 1)
+
+    def test_failed_flush_keeps_hits(self):
+        day = date(2026, 3, 9)
+        visitor_counter.hit(day, "a")
+        with mock.patch.object(visitor_counter, "_add", side_effect=DatabaseError("locked")), \
+                self.assertLogs("leaves.visitor_counter", "ERROR"):
+            self.assertEqual(visitor_counter.flush(), 0)
+        visitor_counter.hit(day, "b")
+        self.assertEqual(visitor_counter.flush(), 2)
+        self.assertEqual(self._count(day), 2)
+
+    def test_middleware_skips_excluded_paths(self):
+        self.client.get("/me/")
+        self.client.get("/api/events/?start=2026-03-01&end=2026-04-01")
+        visitor_counter.flush()
+        self.assertEqual(self._count(timezone.localdate()), 1)
+
+
+class UniqueVisitorTests(LeavesTestCase):
+    """고유 방문자 수 근사 (HyperLogLog, 일별 스케치 합치기)"""
+
+    def setUp(self):
+        visitor_counter.flush()
+
+    def test_estimate_error_and_duplicates(self):
+        sketch = hll.empty()
+        for i in range(20000):
+            hll.add(sketch, f"visitor-{i % 10000}")   # 같은 방문자 두 번씩
+        self.assertLess(abs(hll.estimate(sketch) - 10000) / 10000, 0.05)
+        small = hll.empty()
+        for i in range(30):
+            hll.add(small, f"v{i}")
+        self.assertLessEqual(abs(hll.estimate(small) - 30), 1)
+        self.assertEqual(hll.estimate(hll.empty()), 0)
+
+    def test_days_merge_as_union(self):
+        # 월: 0~599, 화: 400~999 -> 주간 고유 1000명 (일별 합 1200 아님)
+        monday, tuesday = date(2026, 3, 9), date(2026, 3, 10)
+        for i in range(600):
+            visitor_counter.hit(monday, f"v{i}")
+            visitor_counter.hit(tuesday, f"v{i + 400}")
+        visitor_counter.flush()
+        visitor_counter.hit(monday, "v0")   # 이미 센 방문자가 다시 -> 다시 반영해도 그대로
+        visitor_counter.flush()
+
+        self.assertEqual(VisitorStat.objects.get(date=monday).count, 601)
+        self.assertLess(abs(visitor_counter.unique_visitors(monday, monday) - 600), 30)
+        self.assertLess(abs(visitor_counter.unique_visitors(monday, tuesday) - 1000), 50)
+        self.assertEqual(len(VisitorStat.objects.get(date=monday).sketch), hll.SIZE)
+
+
+class LeaveImportTests(LeavesTestCase):
+    """일괄 등록 (CSV, 미리보기 숫자 = 저장 숫자)"""
+
+    def setUp(self):
+        self.emp = Employee.objects.create(name="이관", birth_yyMMdd="900101")
+        services.grant_comp_days([self.emp.id], 2026, date(2026, 1, 1), "신정", "1.0")
+        self.existing = services.submit_leave(
+            self.emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 3, 11), date(2026, 3, 11), "", 1
+        )
+
+    def _rows(self, *lines):
+        text = "이름,종류,오전오후,시작일,종료일,사유\n" + "\n".join(lines) + "\n"
+        return leave_import.read_rows(io.BytesIO(text.encode("utf-8-sig")), "old.csv")
+
+    def test_dry_run_matches_saved_split(self):
+        self.assertEqual(self.existing.used_comp, Decimal("1"))
+        rows = self._rows("이관,연차,,2026-03-09,2026-03-09,예전 기록")
+
+        preview = leave_import.import_rows(rows, dry_run=True)
+        self.assertTrue(preview.ok)
+        self.assertEqual(LeaveRequest.objects.count(), 1)
+        self.assertEqual(preview.by_employee["이관"]["used_comp"], Decimal("1"))
+        self.assertEqual(preview.resplit, [("이관", date(2026, 3, 11), Decimal("1"), Decimal("0"))])
+
+        saved = leave_import.import_rows(rows)
+        self.assertEqual(saved.created, 1)
+        self.assertEqual(saved.by_employee, preview.by_employee)
+        split = dict(LeaveRequest.objects.values_list("start_date", "used_comp"))
+        self.assertEqual(split, {date(2026, 3, 9): Decimal("1"), date(2026, 3, 11): Decimal("0")})
+        self.assertEqual(ledger.verify(), [])
+
+    def test_bad_end_date_is_row_error(self):
+        report = leave_import.import_rows(self._rows(
+            "이관,연차,,2026-04-06,2026/04/07,",
+            "이관,연차,,2026-04-08,,",
+        ))
+        self.assertEqual(report.errors, [(2, "시작일/종료일 확인 (YYYY-MM-DD)")])
+        self.assertEqual(LeaveRequest.objects.count(), 1)
+
+    def test_half_day_on_same_date_conflicts(self):
+        day = date(2026, 4, 15)
+        services.submit_leave(self.emp, LeaveRequest.LeaveType.HALF, LeaveRequest.HalfDay.AM, day, day, "", 0.5)
+        report = leave_import.import_rows(self._rows("이관,반차,오후,2026-04-15,2026-04-15,"))
+        self.assertEqual(report.errors, [(2, "이관 2026-04-15 이미 휴무 있음")])
+
+
+class BulkImportTests(LeavesTestCase):
+    """일괄 등록 (여러 직원, 오류 있으면 저장 안 함, 명령/관리자 화면)"""
+
+    header = "name,leave_type,half_day,start_date,end_date,reason\n"
+
+    def setUp(self):
+        self.kim = Employee.objects.create(name="김", birth_yyMMdd="900101")
+        self.lee = Employee.objects.create(name="이", birth_yyMMdd="900101")
+        services.grant_comp_days([self.kim.id], 2026, date(2026, 1, 1), "신정", "1.0")
+
+    def _csv(self, *lines):
+        return (self.header + "\n".join(lines) + "\n").encode("utf-8")
+
+    def test_saves_with_batched_bookkeeping(self):
+        rows = leave_import.read_rows(io.BytesIO(self._csv(
+            "김,annual,,2026-03-09,2026-03-10,",
+            "김,half,am,2026-03-12,,",
+            "이,연차,,2026-12-31,2027-01-02,연말",
+        )), "old.csv")
+        report = leave_import.import_rows(rows)
+        self.assertEqual((report.errors, report.created), ([], 3))
+        self.assertEqual(report.by_employee["김"], {"count": 2, "used_comp": Decimal("1"), "used_annual": Decimal("1.5")})
+        self.assertEqual(report.by_employee["이"]["used_annual"], Decimal("1"))
+        self.assertEqual(ledger.verify(), [])
+        self.assertEqual(CompDayUse.objects.get().amount, Decimal("1.0"))
+        self.assertTrue(occupancy.is_off(self.kim.id, date(2026, 3, 12), occupancy.AM))
+        self.assertFalse(Notification.objects.exists())   # 알림 없음
+
+    def test_any_error_saves_nothing(self):
+        rows = leave_import.read_rows(io.BytesIO(self._csv(
+            "김,annual,,2026-03-09,2026-03-10,",
+            "박,annual,,2026-03-09,2026-03-09,",
+            "이,annual,,2026-04-06,2026-04-08,",
+            "이,half,pm,2026-04-07,,",
+        )), "old.csv")
+        report = leave_import.import_rows(rows)
+        self.assertEqual(report.errors, [(3, "직원 없음: 박"), (5, "이 2026-04-07 이미 휴무 있음")])
+        self.assertEqual(report.created, 0)
+        self.assertFalse(LeaveRequest.objects.exists())
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as f:
+            f.write(self._csv("김,annual,,2026-03-09,2026-03-09,"))
+            f.flush()
+            out = io.StringIO()
+            call_command("import_leaves", f.name, "--dry-run", stdout=out)
+            self.assertIn("- 김: 1건 / 대체 1 / 연차 0", out.getvalue())
+            self.assertFalse(LeaveRequest.objects.exists())
+            call_command("import_leaves", f.name, stdout=io.StringIO())
+            self.assertEqual(LeaveRequest.objects.get().used_comp, Decimal("1.0"))
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as f, mock.patch.dict(sys.modules, {"openpyxl": None}):
+            with self.assertRaisesMessage(CommandError, "openpyxl"):
+                call_command("import_leaves", f.name, stdout=io.StringIO())
+
+    def test_admin_upload(self):
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.login(username="admin", password="pw")
+        url = "/admin/leaves/leaverequest/import/"
+        upload = lambda: SimpleUploadedFile("old.csv", self._csv("이,annual,,2026-03-09,2026-03-09,"))  # noqa: E731
+
+        preview = self.client.post(url, {"file": upload(), "dry_run": "on"})
+        self.assertEqual(preview.status_code, 200)
+        self.assertContains(preview, "- 이: 1건")
+        self.assertFalse(LeaveRequest.objects.exists())
+
+        saved = self.client.post(url, {"file": upload()})
+        self.assertEqual(saved.status_code, 302)
+        self.assertEqual(LeaveRequest.objects.get().employee, self.lee)
+
+
+class ViewMetricsTests(LeavesTestCase):
+    """뷰별 응답 시간 / 쿼리 수 기록 (시간 x 뷰 이름 행에 합침)"""
+
+    def setUp(self):
+        view_metrics.flush()
+        self.emp = Employee.objects.create(name="측정", birth_yyMMdd="900101")
+
+    def test_histogram_percentiles(self):
+        hist = [0] * view_metrics.N_BUCKETS
+        for ms in [1] * 90 + [40] * 9 + [60000]:
+            hist[view_metrics.bucket_index(ms)] += 1
+        self.assertEqual(view_metrics.percentile(hist, 0.50), 1)
+        self.assertEqual(view_metrics.percentile(hist, 0.95), 50)
+        self.assertIsNone(view_metrics.percentile(hist, 1.0))   # 30초 이상 칸
+        self.assertEqual(view_metrics.percentile([0] * view_metrics.N_BUCKETS, 0.5), 0)
+
+    def test_middleware_records_per_view(self):
+        for _ in range(2):
+            self.client.get(f"/me/{self.emp.id}/")
+        self.client.get("/no-such-page/")
+        view_metrics.flush()
+        self.client.get(f"/me/{self.emp.id}/")
+        view_metrics.flush()
+
+        (row,) = ViewMetric.objects.all()
+        self.assertEqual((row.view_name, row.count, row.errors), ("leaves:me_detail", 3, 0))
+        self.assertGreater(row.queries, 0)
+        self.assertEqual(sum(row.wall_hist), 3)
+
+    def test_admin_page(self):
+        self.client.get(f"/me/{self.emp.id}/")
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.login(username="admin", password="pw")
+        resp = self.client.get("/manage/metrics/?hours=1")
+        self.assertEqual(resp.status_code, 200)
+        (row,) = [r for r in resp.context["rows"] if r["view_name"] == "leaves:me_detail"]
+        self.assertEqual(row["count"], 1)
+        self.assertGreater(row["queries_avg"], 0)
+
+
+class MiddlewareAsyncTests(LeavesTestCase):
+    """async 뷰 앞에서 미들웨어가 스레드로 바뀌지 않음"""
+
+    def test_async_capable(self):
+        from asgiref.sync import iscoroutinefunction
+
+        from .middleware import BalanceMemoMiddleware, ViewMetricsMiddleware, VisitorCountMiddleware
+
+        async def view(request):
+            return None
+
+        for middleware in (VisitorCountMiddleware, BalanceMemoMiddleware, ViewMetricsMiddleware):
+            self.assertTrue(middleware.async_capable)
+            self.assertTrue(iscoroutinefunction(middleware(view)))
+            self.assertFalse(iscoroutinefunction(middleware(lambda request: None)))
+
+
+class SubmitConcurrencyTests(LeavesTestCase):
+    """같은 직원 동시 신청 (ledger.compare_and_apply)"""
+
+    def _read(self, ly_id):
+        # services._submit_once 와 같은 읽기 (LeaveYear + 잔여 집계)
+        names = (*ledger.BALANCE_FIELDS, "version")
+        row = LeaveYear.objects.filter(id=ly_id).values(*["balance__" + f for f in names]).get()
+        return {f: row["balance__" + f] for f in names}
+
+    def test_interleaved_zero_unit_submissions(self):
+        # 주말만 고른 기간 = 0일 -> 잔여 합계는 그대로, version 으로만 겹침을 알 수 있음
+        emp = Employee.objects.create(name="동시", birth_yyMMdd="900101")
+        first = services.submit_leave(emp, LeaveRequest.LeaveType.ANNUAL, None, date(2026, 10, 5), date(2026, 10, 5), "", 1)
+        ly_id = first.leave_year_id
+
+        a = self._read(ly_id)
+        b = self._read(ly_id)
+        self.assertTrue(ledger.compare_and_apply(ly_id, a))
+        self.assertFalse(ledger.compare_and_apply(ly_id, b))   # 다시 읽고 재시도 -> 중복 확인에서 걸림
+        self.assertTrue(ledger.compare_and_apply(ly_id, self._read(ly_id)))
+
+
+class SubmitThreadTests(FlushBuffersMixin, TransactionTestCase):
+    """동시 신청을 실제 스레드(연결 여러 개)로 (SQLite 쓰기 잠금 포함)"""
+
+    def _run(self, calls):
+        results = [None] * len(calls)
+        barrier = threading.Barrier(len(calls))
+
+        def worker(i, args):
+            barrier.wait()
+            try:
+                services.submit_leave(*args)
+                results[i] = "ok"
+            except Exception as e:
+                results[i] = type(e).__name__
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i, args)) for i, args in enumerate(calls)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_same_employee_same_day(self):
+        emp = Employee.objects.create(name="동시1", birth_yyMMdd="900101")
+        day = date(2026, 4, 6)
+        results = self._run([(emp, LeaveRequest.LeaveType.ANNUAL, None, day, day, "", 1)] * 8)
+        self.assertEqual(sorted(results), ["DuplicateLeave"] * 7 + ["ok"])
+        self.assertEqual(LeaveRequest.objects.filter(employee=emp).count(), 1)
+        self.assertEqual(ledger.verify(), [])
+
+    def test_different_employees(self):
+        emps = [Employee.objects.create(name=f"동시{i}", birth_yyMMdd="900101") for i in range(2, 10)]
+        day = date(2026, 4, 7)
+        results = self._run([(e, LeaveRequest.LeaveType.ANNUAL, None, day, day, "", 1) for e in emps])
+        self.assertEqual(results, ["ok"] * 8)
+        self.assertEqual(ledger.verify(), [])
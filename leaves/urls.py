@@ -1,29 +1,46 @@
 # leaves/urls.py
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ✅ ASGI(uvicorn 등)로 띄우면 공개 조회 화면은 async 버전 사용 (leave/asgi.py)
+if settings.LEAVE_ASYNC_VIEWS:
+    calendar_view = views.calendar_view_async
+    events_api = views.events_api_async
+    events_changes = views.events_changes_async
+    me_detail = views.me_detail_async
+else:
+    calendar_view = views.calendar_view
+    events_api = views.events_api
+    events_changes = views.events_changes
+    me_detail = views.me_detail
+
 app_name = "leaves"
 
 urlpatterns = [
     # ===== Public =====
-    path("", views.calendar_view, name="calendar"),
+    path("", calendar_view, name="calendar"),
     path("embed/calendar/", views.calendar_embed, name="calendar_embed"),
-    path("api/events/", views.events_api, name="events_api"),
+    path("api/events/", events_api, name="events_api"),
+    path("api/events/changes/", events_changes, name="events_changes"),
     path("request/new/", views.request_new, name="request_new"),
 
     # 개인 페이지 (생년월일 인증 흐름)
     path("me/", views.me_lookup, name="me_lookup"),                 # 생년월일 입력/선택
-    path("me/<int:employee_id>/", views.me_detail, name="me_detail"),# 개인 상세
+    path("me/<int:employee_id>/", me_detail, name="me_detail"),# 개인 상세
 
     # 직원 공개 리스트(원하면 유지, 아니면 제거 가능)
     path("staff/", views.staff_list, name="staff_list"),
     path("staff/<int:employee_id>/", views.staff_detail, name="staff_detail"),
+    path("employee/<int:employee_id>/", views.employee_detail, name="employee_detail"),   # ?year=
 
     # ===== 관리자 전용(앱 내부 관리 화면) =====
     # ⚠️ Django admin(/admin/)과 혼동 피하려고 manage/로 분리
     path("manage/summary/", views.admin_summary, name="admin_summary"),  # 기본: 올해 요약
     path("manage/summary/<int:year>/", views.admin_summary, name="admin_summary_year"),
 
+    path("manage/metrics/", views.admin_metrics, name="admin_metrics"),  # 뷰별 응답 시간
+
     path("manage/employees/", views.admin_employee_list, name="admin_employee_list"),
     path("manage/employee/<int:employee_id>/<int:year>/", views.admin_employee_detail, name="admin_employee_detail"),
 
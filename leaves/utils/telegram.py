@@ -1,35 +1,90 @@
 import os
+import threading
+
 import requests
+from django.conf import settings
 
-def send_telegram(text: str) -> bool:
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
+# 로컬 가짜 서버로 시험할 때 바꿈 (예: http://127.0.0.1:8081)
+TELEGRAM_API_BASE = getattr(settings, "TELEGRAM_API_BASE", "https://api.telegram.org")
+TELEGRAM_TIMEOUT = getattr(settings, "TELEGRAM_TIMEOUT", 8)
 
-    if not token or not chat_id:
-        print("TELEGRAM: missing env TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID")
-        return False
+_local = threading.local()
+
+
+class TelegramError(Exception):
+    """
+    전송 실패
+    - retry_after: 429 응답이면 텔레그램이 알려준 대기 시간(초)
+    - permanent: 다시 보내도 안 되는 경우 (토큰/채팅방 설정 오류 등)
+    """
+    def __init__(self, message, retry_after=None, permanent=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+
+def _session() -> requests.Session:
+    # ✅ 스레드마다 세션 하나 (연결 재사용, requests.Session 은 스레드 공용 X)
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+
+def _config(chat_id=None):
+    token = getattr(settings, "TELEGRAM_BOT_TOKEN", "") or os.getenv("TELEGRAM_BOT_TOKEN")
+    chat_id = chat_id or getattr(settings, "TELEGRAM_CHAT_ID", "") or os.getenv("TELEGRAM_CHAT_ID")
+    return token, chat_id
+
+
+def resolve_chat_id(chat_id=None) -> str:
+    """비어 있으면 기본 채팅방"""
+    return _config(chat_id)[1] or ""
+
+
+def deliver(text: str, chat_id=None) -> None:
+    """1건 전송 (실패하면 TelegramError)"""
+    token, chat_id = _config(chat_id)
+    if not token or not chat_id:
+        raise TelegramError("missing TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID", permanent=True)
 
     try:
-        resp = requests.post(
-            url,
+        resp = _session().post(
+            f"{TELEGRAM_API_BASE}/bot{token}/sendMessage",
             json={
                 "chat_id": chat_id,
                 "text": text,
                 "disable_web_page_preview": True,
             },
-            timeout=8,
+            timeout=TELEGRAM_TIMEOUT,
         )
-        # ✅ 실패 원인 확인
-        if resp.status_code != 200:
-            print("TELEGRAM ERROR:", resp.status_code, resp.text[:300])
-            return False
+    except requests.RequestException as e:
+        raise TelegramError(f"TELEGRAM EXCEPTION: {e!r}")
 
-        return True
+    if resp.status_code == 200:
+        return
+    retry_after = None
+    if resp.status_code == 429:
+        try:
+            retry_after = resp.json().get("parameters", {}).get("retry_after")
+        except ValueError:
+            pass
+    # 400/401/403/404 = 설정 오류 -> 재시도해도 같음
+    raise TelegramError(
+        f"TELEGRAM ERROR: {resp.status_code} {resp.text[:200]}",
+        retry_after=retry_after,
+        permanent=resp.status_code in (400, 401, 403, 404),
+    )
 
-    except Exception as e:
-        # print("TELEGRAM EXCEPTION:", repr(e))
-        raise RuntimeError(f"TELEGRAM EXCEPTION: {repr(e)}")
-        return False
 
+def send_telegram(text: str, chat_id=None) -> bool:
+    """
+    예전 호출 호환: 바로 보내지 않고 보낼 함에 기록 (leaves/outbox.py, 묶어 보내기 / 속도 제한 / 재시도)
+    호출한 쪽 트랜잭션이 커밋되면 전달. 기록했으면 True
+    """
+    from .. import outbox  # 지연 import (outbox 가 이 모듈을 import)
+    outbox.enqueue(text, chat_id or "")
+    return True
@@ -0,0 +1,226 @@
+# leaves/view_metrics.py
+"""
+뷰별 응답 시간 / DB 시간 / 쿼리 수 기록 (ViewMetricsMiddleware)
+- 요청마다 메모리 히스토그램(고정 구간)에 더하기만
+- 일정 시간(VIEW_METRICS_FLUSH_SECONDS)마다 시간 단위 ViewMetric 행에 합쳐서 저장 (종료 시 atexit)
+  -> 행 수 = 시간 x 뷰 이름, 요청 수와 무관
+- manage/metrics/ 에서 p50/p95/p99, 느린 뷰 순으로 표시
+- 스트리밍 응답(SSE 등)은 첫 응답까지의 시간만 잡힘
+- DB 시간은 모든 연결에 붙인 execute wrapper 가 현재 요청(contextvar)에 더함
+  -> async 뷰의 쿼리가 sync_to_async 스레드의 다른 연결에서 실행돼도 같은 요청으로 집계
+"""
+import atexit
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VIEW_METRICS_FLUSH_SECONDS = getattr(settings, "VIEW_METRICS_FLUSH_SECONDS", 60)
+
+# 히스토그램 구간 상한(ms). 마지막 칸은 그 이상 전부
+BUCKETS_MS = (
+    1, 2, 3, 5, 7, 10, 15, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750,
+    1000, 1500, 2000, 3000, 5000, 10000, 30000,
+)
+N_BUCKETS = len(BUCKETS_MS) + 1
+
+
+def bucket_index(ms: float) -> int:
+    return bisect.bisect_left(BUCKETS_MS, ms)
+
+
+def percentile(hist, q: float):
+    """히스토그램 -> q 분위수(해당 구간 상한 ms, 마지막 칸이면 None = 30초 이상)"""
+    total = sum(hist)
+    if not total:
+        return 0
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen >= rank:
+            return BUCKETS_MS[i] if i < len(BUCKETS_MS) else None
+    return None
+
+
+def add_hist(a, b):
+    return [x + y for x, y in zip(a or [0] * N_BUCKETS, b or [0] * N_BUCKETS)]
+
+
+class _Stat:
+    __slots__ = ("count", "errors", "wall", "db", "db_ms", "queries", "queries_max", "wall_max")
+
+    def __init__(self):
+        self.count = self.errors = self.queries = self.queries_max = 0
+        self.db_ms = self.wall_max = 0.0
+        self.wall = [0] * N_BUCKETS
+        self.db = [0] * N_BUCKETS
+
+
+_db_stats = contextvars.ContextVar("view_metrics_db", default=None)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    stats = _db_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats["ms"] += (time.perf_counter() - started) * 1000
+        stats["queries"] += 1
+
+
+@receiver(connection_created)
+def _install_db_wrapper(sender, connection, **kwargs):
+    # 맨 앞에 (execute_wrapper() 컨텍스트는 끝날 때 마지막 것을 pop 하므로)
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _db_wrapper)
+
+
+@contextmanager
+def track_db():
+    """이 블록(요청) 안 쿼리 수 / DB 시간 -> {"ms", "queries"}"""
+    _install_db_wrapper(None, connection)   # 이 모듈보다 먼저 열린 연결 대비
+    stats = {"ms": 0.0, "queries": 0}
+    token = _db_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _db_stats.reset(token)
+
+
+_lock = threading.Lock()
+_stats = {}      # {(시간, 뷰 이름): _Stat}
+_last_flush = time.monotonic()
+
+
+def record(view_name: str, wall_ms: float, db_ms: float, queries: int, status: int) -> bool:
+    """
+    요청 1건 (메모리 히스토그램에 더하기만)
+    return: 반영할 때가 됐는지 -> True 면 호출한 쪽에서 flush() (async 면 스레드에서)
+    """
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    with _lock:
+        stat = _stats.get((hour, view_name))
+        if stat is None:
+            stat = _stats[(hour, view_name)] = _Stat()
+        stat.count += 1
+        stat.errors += status >= 500
+        stat.wall[bucket_index(wall_ms)] += 1
+        stat.db[bucket_index(db_ms)] += 1
+        stat.db_ms += db_ms
+        stat.queries += queries
+        stat.queries_max = max(stat.queries_max, queries)
+        stat.wall_max = max(stat.wall_max, wall_ms)
+        return time.monotonic() - _last_flush >= VIEW_METRICS_FLUSH_SECONDS
+
+
+def _merge_row(hour, view_name, stat) -> None:
+    from .models import ViewMetric  # 지연 import
+
+    for _ in range(2):
+        row = (
+            ViewMetric.objects.select_for_update()
+            .filter(hour=hour, view_name=view_name)
+            .only("id", "wall_hist", "db_hist", "queries_max", "wall_max_ms")
+            .first()
+        )
+        if row is not None:
+            ViewMetric.objects.filter(pk=row.pk).update(
+                count=F("count") + stat.count,
+                errors=F("errors") + stat.errors,
+                db_ms=F("db_ms") + stat.db_ms,
+                queries=F("queries") + stat.queries,
+                queries_max=max(row.queries_max, stat.queries_max),
+                wall_max_ms=max(row.wall_max_ms, stat.wall_max),
+                wall_hist=add_hist(row.wall_hist, stat.wall),
+                db_hist=add_hist(row.db_hist, stat.db),
+            )
+            return
+        try:
+            with transaction.atomic():
+                ViewMetric.objects.create(
+                    hour=hour, view_name=view_name,
+                    count=stat.count, errors=stat.errors,
+                    db_ms=stat.db_ms, queries=stat.queries, queries_max=stat.queries_max,
+                    wall_max_ms=stat.wall_max, wall_hist=stat.wall, db_hist=stat.db,
+                )
+            return
+        except IntegrityError:
+            continue  # 다른 워커가 먼저 만들었음 -> 다시 읽어서 합치기
+
+
+def flush() -> int:
+    """모인 기록을 ViewMetric 에 합치기 -> 반영한 (시간, 뷰) 수"""
+    global _stats, _last_flush
+    with _lock:
+        batch, _stats = _stats, {}
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+    try:
+        with transaction.atomic():
+            for (hour, view_name), stat in sorted(batch.items()):
+                _merge_row(hour, view_name, stat)
+    except Exception:
+        # 기록용이라 실패하면 버림 (요청 처리에는 영향 없음)
+        logger.exception("뷰 측정값 반영 실패 (%d건 버림)", len(batch))
+        return 0
+    return len(batch)
+
+
+def summary(hours: int = 24):
+    """최근 hours 시간 뷰별 집계 (p95 느린 순)"""
+    from .models import ViewMetric  # 지연 import
+
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    merged = {}
+    for row in ViewMetric.objects.filter(hour__gte=since):
+        m = merged.setdefault(row.view_name, {
+            "view_name": row.view_name, "count": 0, "errors": 0, "db_ms": 0.0, "queries": 0,
+            "queries_max": 0, "wall_max_ms": 0.0, "wall_hist": None, "db_hist": None,
+        })
+        m["count"] += row.count
+        m["errors"] += row.errors
+        m["db_ms"] += row.db_ms
+        m["queries"] += row.queries
+        m["queries_max"] = max(m["queries_max"], row.queries_max)
+        m["wall_max_ms"] = max(m["wall_max_ms"], row.wall_max_ms)
+        m["wall_hist"] = add_hist(m["wall_hist"], row.wall_hist)
+        m["db_hist"] = add_hist(m["db_hist"], row.db_hist)
+
+    rows = []
+    for m in merged.values():
+        rows.append({
+            "view_name": m["view_name"],
+            "count": m["count"],
+            "errors": m["errors"],
+            "p50": percentile(m["wall_hist"], 0.50),
+            "p95": percentile(m["wall_hist"], 0.95),
+            "p99": percentile(m["wall_hist"], 0.99),
+            "max_ms": round(m["wall_max_ms"]),
+            "db_p95": percentile(m["db_hist"], 0.95),
+            "db_avg_ms": round(m["db_ms"] / m["count"], 1),
+            "queries_avg": round(m["queries"] / m["count"], 1),
+            "queries_max": m["queries_max"],
+        })
+    # 느린 순 (30초 이상 칸은 None -> 맨 앞)
+    rows.sort(key=lambda r: (r["p95"] is not None, -(r["p95"] or 0), -r["count"]))
+    return rows
+
+
+atexit.register(flush)
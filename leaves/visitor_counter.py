@@ -0,0 +1,104 @@
+# leaves/visitor_counter.py
+"""
+방문자 카운트 모아서 쓰기
+- 요청마다 DB 쓰기(get_or_create + UPDATE) 대신 프로세스 메모리에서 날짜별로 더하기만
+- 일정 시간(VISITOR_FLUSH_SECONDS) 또는 건수(VISITOR_FLUSH_EVERY)가 차면 한 번에 반영
+- 반영은 F("count") + n 증감 -> gunicorn 워커 여러 개가 각자 반영해도 안 겹침
+- 프로세스 종료 시(atexit) 남은 것 반영 / 반영 실패하면 다음 번에 다시
+- 고유 방문자는 날짜별 HyperLogLog 스케치(hll.py)로 같이 모아서 DB 스케치와 합침
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import hll
+
+logger = logging.getLogger(__name__)
+
+# 이 시간(초)이 지나거나 이 건수가 쌓이면 DB 반영
+VISITOR_FLUSH_SECONDS = getattr(settings, "VISITOR_FLUSH_SECONDS", 30)
+VISITOR_FLUSH_EVERY = getattr(settings, "VISITOR_FLUSH_EVERY", 200)
+
+_lock = threading.Lock()
+_pending = Counter()     # {date: 아직 반영 안 한 방문 수}
+_sketches = {}           # {date: 아직 반영 안 한 HyperLogLog 레지스터}
+_pending_total = 0
+_last_flush = time.monotonic()
+
+
+def hit(day, visitor_key: str) -> bool:
+    """
+    방문 1건 (dict 더하기 + 레지스터 1바이트 갱신만)
+    return: 반영할 때가 됐는지 -> True 면 호출한 쪽에서 flush() (async 면 스레드에서)
+    """
+    global _pending_total
+    with _lock:
+        _pending[day] += 1
+        sketch = _sketches.get(day)
+        if sketch is None:
+            sketch = _sketches[day] = hll.empty()
+        hll.add(sketch, visitor_key)
+        _pending_total += 1
+        return _pending_total >= VISITOR_FLUSH_EVERY or time.monotonic() - _last_flush >= VISITOR_FLUSH_SECONDS
+
+
+def _add(day, n, sketch) -> None:
+    from .models import VisitorStat  # 지연 import (atexit 시점에도 앱 로딩 순서 무관)
+
+    for _ in range(2):
+        row = VisitorStat.objects.select_for_update().filter(date=day).only("id", "sketch").first()
+        if row is not None:
+            VisitorStat.objects.filter(pk=row.pk).update(
+                count=F("count") + n,
+                sketch=bytes(hll.merge(row.sketch, sketch)),   # 최대값 합치기라 여러 번 반영돼도 같음
+            )
+            return
+        try:
+            with transaction.atomic():
+                VisitorStat.objects.create(date=day, count=n, sketch=bytes(sketch))
+            return
+        except IntegrityError:
+            continue  # 다른 워커가 먼저 만들었음 -> 다시 읽어서 합치기
+
+
+def flush() -> int:
+    """모인 방문 수 DB 반영 -> 반영한 건수"""
+    global _pending, _sketches, _pending_total, _last_flush
+    with _lock:
+        batch, _pending = _pending, Counter()
+        sketches, _sketches = _sketches, {}
+        _pending_total = 0
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+    try:
+        with transaction.atomic():
+            for day, n in sorted(batch.items()):
+                _add(day, n, sketches.get(day) or hll.empty())
+    except Exception:
+        # DB 잠김 등 -> 버리지 않고 다음 반영 때 같이
+        logger.exception("방문자 카운트 반영 실패 (%d건 보류)", sum(batch.values()))
+        with _lock:
+            _pending.update(batch)
+            _pending_total += sum(batch.values())
+            for day, sketch in sketches.items():
+                _sketches[day] = hll.merge(_sketches.get(day), sketch)
+        return 0
+    return sum(batch.values())
+
+
+def unique_visitors(start, end) -> int:
+    """start~end(포함) 고유 방문자 수 근사 (일별 스케치 합치기, 반영된 것만)"""
+    from .models import VisitorStat  # 지연 import
+
+    sketches = VisitorStat.objects.filter(date__gte=start, date__lte=end).values_list("sketch", flat=True)
+    return hll.estimate(hll.merge(*sketches))
+
+
+atexit.register(flush)
@@ -0,0 +1,151 @@
+// static/calendar_events.js
+// 달력 이벤트 피드 공용 스크립트 (calendar.html / calendar_embed.html)
+
+// ✅ events_api?format=compact 응답 -> FullCalendar 이벤트 배열
+function expandCompactEvents(data) {
+  const base = new Date(data.base + 'T00:00:00');
+  const HALF = ['', '오전', '오후'];
+
+  function day(offset) {
+    const d = new Date(base);
+    d.setDate(d.getDate() + offset);
+    const m = String(d.getMonth() + 1).padStart(2, '0');
+    const dd = String(d.getDate()).padStart(2, '0');
+    return `${d.getFullYear()}-${m}-${dd}`;
+  }
+
+  const events = [];
+  const L = data.leave;
+  for (let i = 0; i < L.id.length; i++) {
+    events.push({
+      id: L.id[i],
+      title: data.names[L.e[i]],
+      start: day(L.s[i]),
+      end: day(L.s[i] + L.n[i]),
+      allDay: true,
+      classNames: ['fc-leave-event'],
+      extendedProps: { halfLabel: HALF[L.h[i]] || '' },
+    });
+  }
+
+  const M = data.memo;
+  for (let i = 0; i < M.id.length; i++) {
+    events.push({
+      id: `memo-${M.id[i]}`,
+      title: M.t[i],
+      start: day(M.s[i]),
+      end: day(M.s[i] + 1),
+      allDay: true,
+      classNames: ['fc-memo-event', `memo-${data.colors[M.k[i]]}`],
+      extendedProps: { memoContent: M.c[i] },
+      editable: false,
+    });
+  }
+
+  const H = data.holiday;
+  for (let i = 0; i < H.s.length; i++) {
+    events.push({
+      id: `holiday-${day(H.s[i])}`,
+      title: H.t[i],
+      start: day(H.s[i]),
+      end: day(H.s[i] + 1),
+      allDay: true,
+      classNames: ['fc-holiday-event'],
+    });
+  }
+  return events;
+}
+
+// ✅ FullCalendar events 옵션에 넣는 함수 (압축 형식으로 받아서 복원)
+function compactEventSource(url) {
+  return function (info, success, failure) {
+    const params = new URLSearchParams({
+      start: info.startStr,
+      end: info.endStr,
+      format: 'compact',
+    });
+    fetch(`${url}?${params}`, { credentials: 'same-origin' })
+      .then((resp) => {
+        if (!resp.ok) throw new Error(`events ${resp.status}`);
+        return resp.json();
+      })
+      .then((data) => success(expandCompactEvents(data)))
+      .catch(failure);
+  };
+}
+
+// ✅ 변경 알림 구독 (SSE, 안 되면 long-poll) -> 달력에 바로 반영
+// 보이는 기간과 겹치는 변경만 받음, 기간이 바뀌면 다시 연결
+// useSSE: 서버가 ASGI 일 때만 true (동기 워커는 짧은 polling, 응답의 retry(ms) 만큼 쉬고 다시)
+function subscribeCalendarChanges(calendar, url, useSSE) {
+  let lastSeq = null;
+  let es = null;
+  let pollToken = 0;
+
+  function apply(change) {
+    lastSeq = change.seq;
+    const old = calendar.getEventById(String(change.id));
+    if (old) old.remove();
+    if (change.action !== 'removed' && change.event) {
+      const source = calendar.getEventSources()[0];
+      calendar.addEvent(change.event, source);
+    }
+  }
+
+  // toISOString() 은 UTC 라 KST 에서는 하루 전 날짜가 됨 -> 현지 날짜로
+  function ymd(d) {
+    const m = String(d.getMonth() + 1).padStart(2, '0');
+    const dd = String(d.getDate()).padStart(2, '0');
+    return `${d.getFullYear()}-${m}-${dd}`;
+  }
+
+  function params() {
+    const view = calendar.view;
+    const p = new URLSearchParams({
+      start: ymd(view.activeStart),
+      end: ymd(view.activeEnd),
+    });
+    if (lastSeq !== null) p.set('since', lastSeq);
+    return p;
+  }
+
+  function connectSSE() {
+    if (es) es.close();
+    es = new EventSource(`${url}?${params()}`);
+    es.addEventListener('hello', (e) => {
+      if (e.lastEventId) lastSeq = Number(e.lastEventId);
+    });
+    es.onmessage = (e) => apply(JSON.parse(e.data));
+  }
+
+  function connectPoll() {
+    const token = ++pollToken;
+    let retry = 0;
+    (async function loop() {
+      while (token === pollToken) {
+        const p = params();
+        p.set('poll', '1');
+        // 동기 서버는 바로 응답 -> 순번(ETag)이 그대로면 304
+        const headers = lastSeq !== null ? { 'If-None-Match': `"${lastSeq}"` } : {};
+        try {
+          const resp = await fetch(`${url}?${p}`, { credentials: 'same-origin', cache: 'no-store', headers });
+          if (resp.status !== 304) {
+            if (!resp.ok) throw new Error(`changes ${resp.status}`);
+            const data = await resp.json();
+            if (token !== pollToken) return;
+            data.changes.forEach(apply);
+            lastSeq = data.last;
+            retry = data.retry || 0;
+          }
+          if (retry) await new Promise((r) => setTimeout(r, retry));
+        } catch (err) {
+          await new Promise((r) => setTimeout(r, 5000));
+        }
+      }
+    })();
+  }
+
+  const connect = useSSE && window.EventSource ? connectSSE : connectPoll;
+  calendar.on('datesSet', connect);
+  connect();
+}